@@ -0,0 +1,85 @@
+"""
+Round trips per giveaway button click against the redis at ``REDIS_URL``.
+
+    python -m benchmarks.giveaway_entry [clicks]
+"""
+
+import json
+import os
+import sys
+import time
+
+from redis import Connection, Redis
+
+from plugins.giveaways.entry import GiveawayEntry
+
+KEY = "benchmark:giveaway"
+
+
+class CountingConnection(Connection):
+    commands = 0
+
+    def send_packed_command(self, command, check_health=True):
+        CountingConnection.commands += 1
+        return super().send_packed_command(command, check_health)
+
+
+def legacy(redis, key, user_id):
+    # what GiveawayView.callback used to do on a cached click
+    json.loads(redis.get(f"db:cache:{key}"))
+    redis.sadd(key, user_id)
+    total = redis.scard(key)
+    if not redis.exists(f"cache:{key}:exit:{user_id}"):
+        redis.set(f"cache:{key}:exit:{user_id}", 1, ex=5)
+    return total
+
+
+def scripted(redis, key, user_id):
+    return entries.click(redis, key, user_id).total
+
+
+def fallback(redis, key, user_id):
+    return no_scripting.click(redis, key, user_id).total
+
+
+entries = GiveawayEntry()
+no_scripting = GiveawayEntry()
+no_scripting.scripting = False
+
+
+def run(redis, name, click, clicks):
+    redis.delete(KEY, f"db:cache:{KEY}")
+    GiveawayEntry().cache(redis, KEY, {"store_key": KEY, "requirements": {}})
+    click(redis, KEY, 0)  # loads the script / warms the connection
+
+    CountingConnection.commands = 0
+    start = time.perf_counter()
+    for user_id in range(1, clicks + 1):
+        click(redis, KEY, user_id)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<10} {CountingConnection.commands / clicks:>5.2f} round trips/click"
+        f" {elapsed / clicks * 1e6:>8.1f}us/click"
+    )
+
+
+def main(clicks=1000):
+    redis = Redis.from_url(
+        os.getenv("REDIS_URL", "redis://localhost:6379"),
+        decode_responses=True,
+        connection_class=CountingConnection,
+    )
+    try:
+        for name, click in (
+            ("legacy", legacy),
+            ("script", scripted),
+            ("fallback", fallback),
+        ):
+            run(redis, name, click, clicks)
+    finally:
+        redis.delete(KEY, f"db:cache:{KEY}", *redis.keys(f"cache:{KEY}:exit:*"))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,134 @@
+"""
+Import time of a cold start, per module, and a check that it stays in budget.
+
+    python -m benchmarks.imports [--runs 5] [--report imports.json]
+        [--budget-ms 1000] [target]
+
+Every run imports ``target`` (main by default) in a fresh interpreter with
+``-X importtime``. The median of each module's timings goes into the json
+report. The exit status is 1 when the total goes over the budget, or when
+``target`` imports one of the modules that are meant to be deferred.
+``IMPORT_BUDGET_MS`` overrides the default budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BUDGET_MS = 1000
+
+# only imported once a request needs them, see squid.models.functions.lazy_import
+DEFERRED = (
+    "TagScriptEngine",
+    "sentry_sdk",
+    "pymongo",
+    "fuzzywuzzy",
+    "expr",
+    "grpc",
+    "plugins.fun",
+    "plugins.giveaways",
+    "plugins.tags",
+)
+
+
+def import_times(target: str) -> List[dict]:
+    """Imports ``target`` in a new interpreter, returns each module's self and
+    cumulative import time in microseconds, in import order"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        modules.append(
+            {
+                "name": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_us": int(own),
+                "cumulative_us": int(cumulative),
+            }
+        )
+    return modules
+
+
+def profile(target: str = "main", runs: int = 5) -> Dict:
+    timings: Dict[str, Dict[str, list]] = {}
+    totals = []
+    for _ in range(runs):
+        modules = import_times(target)
+        totals.append(sum(m["self_us"] for m in modules))
+        for m in modules:
+            t = timings.setdefault(
+                m["name"], {"depth": m["depth"], "self": [], "cum": []}
+            )
+            t["self"].append(m["self_us"])
+            t["cum"].append(m["cumulative_us"])
+
+    modules = [
+        {
+            "name": name,
+            "depth": t["depth"],
+            "self_us": int(statistics.median(t["self"])),
+            "cumulative_us": int(statistics.median(t["cum"])),
+        }
+        for name, t in timings.items()
+    ]
+    modules.sort(key=lambda m: m["self_us"], reverse=True)
+    return {
+        "target": target,
+        "runs": runs,
+        "total_us": int(statistics.median(totals)),
+        "modules": modules,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("target", nargs="?", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--report", default="imports.json")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("IMPORT_BUDGET_MS", BUDGET_MS)),
+    )
+    args = parser.parse_args(argv)
+
+    report = profile(args.target, args.runs)
+    report["budget_us"] = int(args.budget_ms * 1000)
+    report["deferred_imported"] = sorted(
+        name
+        for name in DEFERRED
+        if any(
+            m["name"] == name or m["name"].startswith(name + ".")
+            for m in report["modules"]
+        )
+    )
+    with open(args.report, "w") as fp:
+        json.dump(report, fp, indent=2)
+
+    print(f"import {args.target}: {report['total_us'] / 1000:.1f}ms")
+    for m in report["modules"][:10]:
+        print(f"  {m['self_us'] / 1000:>7.1f}ms  {m['name']}")
+
+    failed = False
+    if report["total_us"] > report["budget_us"]:
+        print(f"over the {args.budget_ms:g}ms budget")
+        failed = True
+    if report["deferred_imported"]:
+        print("imported eagerly: " + ", ".join(report["deferred_imported"]))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
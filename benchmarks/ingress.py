@@ -0,0 +1,100 @@
+"""
+Per request overhead of verifying and parsing an interaction before the bot
+sees it.
+
+    python -m benchmarks.ingress [requests]
+"""
+
+import io
+import json
+import os
+import sys
+import time
+
+from nacl.signing import SigningKey, VerifyKey
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+signing_key = SigningKey.generate()
+os.environ["PUBLIC_KEY"] = signing_key.verify_key.encode().hex()
+
+import main as entrypoint  # noqa: E402 reads PUBLIC_KEY
+
+BODY = json.dumps(
+    {
+        "id": "1",
+        "application_id": "2",
+        "type": 2,
+        "token": "t" * 200,
+        "guild_id": "3",
+        "channel_id": "4",
+        "version": 1,
+        "member": {
+            "roles": [str(i) for i in range(20)],
+            "user": {"id": "5", "username": "u", "discriminator": "0001"},
+        },
+        "data": {
+            "id": "6",
+            "name": "giveaway",
+            "type": 1,
+            "options": [
+                {
+                    "name": "start",
+                    "type": 1,
+                    "options": [
+                        {"name": "time", "type": 3, "value": "1d"},
+                        {"name": "winners", "type": 4, "value": 1},
+                        {"name": "prize", "type": 3, "value": "nitro " * 20},
+                    ],
+                }
+            ],
+        },
+    }
+).encode()
+
+
+def build():
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + BODY).signature.hex()
+    return EnvironBuilder(
+        method="POST",
+        data=BODY,
+        content_type="application/json",
+        headers={
+            "X-Signature-Ed25519": signature,
+            "X-Signature-Timestamp": timestamp,
+        },
+    ).get_environ()
+
+
+def legacy(request):
+    # what squidbot did before reading the body once
+    verify_key = VerifyKey(bytes.fromhex(os.getenv("PUBLIC_KEY") or ""))
+    signature = request.headers["X-Signature-Ed25519"]
+    timestamp = request.headers["X-Signature-Timestamp"]
+    body = request.data.decode("utf-8")
+    verify_key.verify(f"{timestamp}{body}".encode(), bytes.fromhex(signature))
+    return request.json
+
+
+def request(environ):
+    return Request({**environ, "wsgi.input": io.BytesIO(BODY)})
+
+
+def run(name, ingress, environ, requests):
+    ingress(request(environ))  # warms the cached key
+    start = time.perf_counter()
+    for _ in range(requests):
+        assert ingress(request(environ)) is not None
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {elapsed / requests * 1e6:>8.1f}us/request")
+
+
+def main(requests=10000):
+    environ = build()
+    for name, ingress in (("legacy", legacy), ("raw", entrypoint.read_interaction)):
+        run(name, ingress, environ, requests)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
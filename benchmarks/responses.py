@@ -0,0 +1,64 @@
+"""
+Serializing interaction responses for flask, through jsonify and orjson.
+
+    python -m benchmarks.responses [responses]
+"""
+
+import sys
+import time
+
+import orjson
+from discord import AllowedMentions, Embed
+from flask import Flask, Response, jsonify
+
+from squid.bot.bot import PONG, UNKNOWN_COMPONENT
+from squid.models.interaction import InteractionResponse
+from plugins.giveaways.views import GiveawayView
+
+RESPONSES = {
+    "pong": lambda: PONG,
+    "unknown": lambda: UNKNOWN_COMPONENT,
+    "embed": lambda: InteractionResponse.channel_message(
+        embed=Embed(
+            title="nitro",
+            description="React with 🎉 to enter!\n" * 10,
+            color=0xEA81AE,
+        ).add_field(name="Hosted by", value="<@1>"),
+        allowed_mentions=AllowedMentions.none(),
+        components=GiveawayView(label=10, key="key").to_components(),
+    ),
+    "update": lambda: InteractionResponse.message_update(
+        components=GiveawayView(label=10, key="key").to_components()
+    ),
+}
+
+
+def legacy(response):
+    return jsonify(response.to_dict())
+
+
+def fast(response):
+    return Response(response.to_json(), mimetype="application/json")
+
+
+def main(responses=10000):
+    with Flask(__name__).app_context():
+        for name, build in RESPONSES.items():
+            response = build()
+            expected = response.to_dict()
+            expected["data"].pop("type", None)
+            assert orjson.loads(fast(response).get_data()) == expected, name
+
+            for serializer in (legacy, fast):
+                start = time.perf_counter()
+                for _ in range(responses):
+                    serializer(response)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{name:<8} {serializer.__name__:<7}"
+                    f" {elapsed / responses * 1e6:>8.1f}us/response"
+                )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -11,31 +11,35 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import hmac
 from inspect import ismethod
 import json
 import logging
 import os
+import threading
+import time
+from typing import Optional
 
 import functions_framework
-import sentry_sdk
-from flask import abort, jsonify
+import orjson
+from flask import Response, abort, jsonify
 import requests
 from nacl.exceptions import BadSignatureError
 from nacl.signing import VerifyKey
-from pymongo import MongoClient
-from redis import Redis
-from sentry_sdk.integrations.gcp import GcpIntegration
-import TagScriptEngine as tse
 
 from squid.bot import SquidBot
+from squid.bot.connection import ManagedRedis
 from squid.bot.errors import CommandFailed
-from squid.models.functions import lazy
+from squid.bot.manifest import Manifest
+from squid.models.functions import Lazy, lazy
 from squid.models.interaction import Interaction
-from squid.settings import Settings
 
 __version__ = "0.0.1"
 
 if sentry_dsn := os.getenv("SENTRY_DSN"):
+    import sentry_sdk
+    from sentry_sdk.integrations.gcp import GcpIntegration
+
     sentry_sdk.init(
         dsn=sentry_dsn,
         integrations=[GcpIntegration(timeout_warning=True)],
@@ -47,8 +51,17 @@ if sentry_dsn := os.getenv("SENTRY_DSN"):
 logging.basicConfig(level=logging.INFO)
 
 
+def log_lazy(name: str, seconds: float):
+    logging.info("%s took %.1fms", name, seconds * 1000)
+
+
+Lazy.add_hook(log_lazy)
+
+
 @lazy
 def setup_db():
+    from pymongo import MongoClient
+
     client = MongoClient(os.getenv("MONGO_URL"))
 
     if bool(os.getenv("PRODUCTION")):
@@ -58,19 +71,22 @@ def setup_db():
     return db
 
 
-def setup_redis() -> Redis:
-    if url := os.getenv("REDIS_URL"):
-        k = {}
-        if password := os.getenv("REDIS_PASS"):
-            k["password"] = password
-        redis = Redis.from_url(url, decode_responses=True, **k)
-    else:
-        redis = Redis()
-    return redis
+def setup_redis() -> ManagedRedis:
+    # a single pool per instance, kept alive between requests on warm instances
+    k = {"decode_responses": True}
+    if password := os.getenv("REDIS_PASS"):
+        k["password"] = password
+    if max_connections := os.getenv("REDIS_MAX_CONNECTIONS"):
+        k["max_connections"] = int(max_connections)
+    return ManagedRedis.from_url(os.getenv("REDIS_URL"), **k)
 
 
 @lazy
 def setup_engine():
+    import TagScriptEngine as tse
+
+    from squid.tagscript import CompiledInterpreter
+
     blocks = [
         tse.MathBlock(),
         tse.RandomBlock(),
@@ -98,11 +114,12 @@ def setup_engine():
         tse.CooldownBlock(),
     ]
 
-    return tse.Interpreter(blocks)
+    return CompiledInterpreter(blocks)
 
 
 @lazy
 def setup_settings():
+    from squid.settings import Settings
 
     # would put this on startup but cold-boot times are kiler
     # req = requests.get(os.getenv("API_URL") + "/static/settings.json")
@@ -114,6 +131,42 @@ def setup_settings():
     return settings
 
 
+# overlaps building the slowest resources with the rest of the cold start,
+# off by default so a ping doesn't compete with them for the cpu
+if os.getenv("PREWARM"):
+    setup_db.prewarm()
+    setup_engine.prewarm()
+
+
+@lazy
+def setup_verify_key():
+    return VerifyKey(bytes.fromhex(os.getenv("PUBLIC_KEY") or ""))
+
+
+def read_interaction(request) -> Optional[dict]:
+    """Verifies the request signature and parses the body, None if the
+    request isn't signed by discord
+
+    The raw body is verified and parsed as is instead of being decoded and
+    re-encoded on the way. A signed body that isn't json is a 400, a missing
+    or malformed ``PUBLIC_KEY`` raises instead of failing every signature.
+    """
+    body = request.get_data()
+    with setup_verify_key as verify_key:
+        try:
+            signature = bytes.fromhex(request.headers["X-Signature-Ed25519"])
+            verify_key.verify(
+                request.headers["X-Signature-Timestamp"].encode() + body, signature
+            )
+        except (BadSignatureError, KeyError, ValueError):
+            return None
+
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        abort(400, "invalid request body")
+
+
 @SquidBot.from_lazy()
 def lazy_bot(cls=SquidBot):
     bot: SquidBot = cls(
@@ -131,12 +184,19 @@ def lazy_bot(cls=SquidBot):
         squid_owner_id=int(os.getenv("OWNER_ID", 0)),
         squid_dashboard_url=os.getenv("dashboard_url", "https://dashboard.squid.pink"),
         squid_application_id=int(os.getenv("APPLICATION_ID", 0)),
+        squid_giveaway_update_interval=float(os.getenv("GIVEAWAY_UPDATE_INTERVAL", 0)),
+        # 0 turns the deadline off
+        squid_response_deadline=float(os.getenv("RESPONSE_DEADLINE", 2.2)) or None,
         squid_requirements={},
         squid__last_result=None,
     )
-    import plugins
+    # routes from the manifest when it's current, plugins are imported on use
+    if (manifest := Manifest.load("./manifest.json")) is not None:
+        bot.defer_extensions(manifest)
+    else:
+        import plugins
 
-    plugins.setup(bot)
+        plugins.setup(bot)
 
     @bot.check
     def check_plugins(ctx):
@@ -158,6 +218,47 @@ def lazy_bot(cls=SquidBot):
     return bot
 
 
+def warm_up(guild_ids=()) -> dict:
+    """Builds the bot and runs :meth:`SquidBot.warm_up`, with timings in ms"""
+    start = time.perf_counter()
+    with lazy_bot as bot:
+        built = round((time.perf_counter() - start) * 1000, 2)
+        steps = bot.warm_up(guild_ids)
+    return {
+        "bot": {"ms": built},
+        **steps,
+        "total": {"ms": round((time.perf_counter() - start) * 1000, 2)},
+    }
+
+
+def warmup_guilds(value: Optional[str]) -> list:
+    """The guild ids in a comma separated list"""
+    return [int(g) for g in (value or "").split(",") if g.strip().isdigit()]
+
+
+def is_warmup(request) -> bool:
+    """A GET with ``?warmup`` carrying the ``WARMUP_TOKEN`` secret"""
+    token = os.getenv("WARMUP_TOKEN")
+    return (
+        bool(token)
+        and "warmup" in request.args
+        and hmac.compare_digest(
+            request.headers.get("X-Warmup-Token", "").encode(), token.encode()
+        )
+    )
+
+
+# the busiest guilds aren't tracked, WARMUP_GUILDS lists the ones to prime
+if os.getenv("WARMUP_ON_START"):
+    threading.Thread(
+        target=lambda: logging.info(
+            "Warmed up: %s", warm_up(warmup_guilds(os.getenv("WARMUP_GUILDS")))
+        ),
+        name="warmup",
+        daemon=True,
+    ).start()
+
+
 @functions_framework.http
 def squidbot(request):
     """Responds to a GET request with "Hello world!". Forbids a PUT request.
@@ -170,26 +271,23 @@ def squidbot(request):
         <https://flask.palletsprojects.com/en/1.1.x/api/#flask.make_response>.
     """
 
+    received_at = time.monotonic()
+
     if request.method == "GET":
+        if is_warmup(request):
+            guilds = request.args.get("guilds") or os.getenv("WARMUP_GUILDS")
+            return Response(
+                orjson.dumps(warm_up(warmup_guilds(guilds))),
+                mimetype="application/json",
+            )
         return "<a href=https://squid.pink/>How'd you get here?</a>", 418
 
     if request.method != "POST":
         return abort(405)
 
-    # key verification
-    PUBLIC_KEY = os.getenv("PUBLIC_KEY") or ""
-
-    verify_key = VerifyKey(bytes.fromhex(PUBLIC_KEY))
-
-    signature = request.headers["X-Signature-Ed25519"]
-    timestamp = request.headers["X-Signature-Timestamp"]
-    body = request.data.decode("utf-8")
-
-    try:
-        verify_key.verify(f"{timestamp}{body}".encode(), bytes.fromhex(signature))
-    except BadSignatureError:
+    if (data := read_interaction(request)) is None:
         return abort(401, "invalid request signature")
-    else:
-        with lazy_bot as bot:
-            interaction = Interaction(state=bot.state, data=request.json)
-            return bot.process(interaction)
+
+    with lazy_bot as bot:
+        interaction = Interaction(state=bot.state, data=data, received_at=received_at)
+        return bot.process(interaction)
@@ -1,23 +1,52 @@
-from .fun import Fun, setup as fun_setup
-from .invitecounting import InviteCounting, setup as invitecounting_setup
-from .mathsolving import MathSolving, setup as mathsolving_setup
-from .messagecounting import MessageCounting, setup as messagecounting_setup
-from .utility import Utility, setup as utility_setup
-from .timers import Timers, setup as timers_setup
-from .dankmemer import DankMemer, setup as dankmemer_setup
-from .giveaways import Giveaways, setup as giveaways_setup
-from .tags import Tags, setup as tags_setup
-from .special_commands import SpecialCommands, setup as commands_setup
+import importlib
+
+# loaded in this order, see manifest.json for what each of them registers
+EXTENSIONS = (
+    "plugins.special_commands",
+    "plugins.utility",
+    "plugins.mathsolving",
+    "plugins.fun",
+    "plugins.invitecounting",
+    "plugins.messagecounting",
+    "plugins.timers",
+    "plugins.dankmemer",
+    "plugins.giveaways",
+    "plugins.tags",
+)
+
+# importing a plugin pulls in its dependencies, so they're only imported on use
+_exports = {
+    "Fun": ("plugins.fun", "Fun"),
+    "fun_setup": ("plugins.fun", "setup"),
+    "InviteCounting": ("plugins.invitecounting", "InviteCounting"),
+    "invitecounting_setup": ("plugins.invitecounting", "setup"),
+    "MathSolving": ("plugins.mathsolving", "MathSolving"),
+    "mathsolving_setup": ("plugins.mathsolving", "setup"),
+    "MessageCounting": ("plugins.messagecounting", "MessageCounting"),
+    "messagecounting_setup": ("plugins.messagecounting", "setup"),
+    "Utility": ("plugins.utility", "Utility"),
+    "utility_setup": ("plugins.utility", "setup"),
+    "Timers": ("plugins.timers", "Timers"),
+    "timers_setup": ("plugins.timers", "setup"),
+    "DankMemer": ("plugins.dankmemer", "DankMemer"),
+    "dankmemer_setup": ("plugins.dankmemer", "setup"),
+    "Giveaways": ("plugins.giveaways", "Giveaways"),
+    "giveaways_setup": ("plugins.giveaways", "setup"),
+    "Tags": ("plugins.tags", "Tags"),
+    "tags_setup": ("plugins.tags", "setup"),
+    "SpecialCommands": ("plugins.special_commands", "SpecialCommands"),
+    "commands_setup": ("plugins.special_commands", "setup"),
+}
+
+
+def __getattr__(name):
+    try:
+        module, attr = _exports[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), attr)
 
 
 def setup(bot):
-    commands_setup(bot)
-    utility_setup(bot)
-    mathsolving_setup(bot)
-    fun_setup(bot)
-    invitecounting_setup(bot)
-    messagecounting_setup(bot)
-    timers_setup(bot)
-    dankmemer_setup(bot)
-    giveaways_setup(bot)
-    tags_setup(bot)
+    for name in EXTENSIONS:
+        bot.load_extension(name)
@@ -1,7 +1,6 @@
 from discord.user import User
 from squid.bot import command, SquidPlugin, CommandContext
 from discord import Embed
-from fuzzywuzzy import process
 from squid.bot.errors import CommandFailed
 
 
@@ -0,0 +1,116 @@
+import random
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from squid.bot import SquidBot
+
+
+class Entrants(object):
+    """
+    Giveaway entrants stored outside of the giveaway document.
+
+    Entrants are split into ``giveaway_entrants`` documents of ``chunk_size``
+    ids each (``{store_key, chunk, users}``) so giveaway metadata stays small
+    no matter how many people joined, and any single entrant can be fetched by
+    position by reading only the chunk it's in.
+
+    Giveaways that were ended with a ``users`` array on the giveaway document
+    are still read through the ``legacy_*`` helpers.
+    """
+
+    COLLECTION = "giveaway_entrants"
+
+    def __init__(self, bot: "SquidBot", *, chunk_size=1000):
+        self.bot = bot
+        self.chunk_size = chunk_size
+        self._indexed = False
+
+    def _collection(self, db):
+        collection = db[self.COLLECTION]
+        if not self._indexed:
+            collection.create_index([("store_key", 1), ("chunk", 1)], unique=True)
+            self._indexed = True
+        return collection
+
+    def write(self, store_key: str, users: Iterable) -> int:
+        """Replaces the stored entrants, ``users`` is consumed lazily so it
+        can be a redis SSCAN iterator
+
+        Every chunk is replaced in place and the ones past the new total are
+        dropped afterwards, so :meth:`count` and :meth:`pick` never see a
+        chunk missing or stored twice while another run rewrites them.
+        """
+        users = iter(users)
+        total = 0
+        with self.bot.db as db:
+            collection = self._collection(db)
+
+            chunk = 0
+            while batch := [str(u) for u in islice(users, self.chunk_size)]:
+                collection.replace_one(
+                    {"store_key": store_key, "chunk": chunk},
+                    {"store_key": store_key, "chunk": chunk, "users": batch},
+                    upsert=True,
+                )
+                total += len(batch)
+                chunk += 1
+
+            collection.delete_many({"store_key": store_key, "chunk": {"$gte": chunk}})
+        return total
+
+    def count(self, store_key: str) -> Optional[int]:
+        """Total entrants, ``None`` if nothing was stored for the giveaway"""
+        with self.bot.db as db:
+            last = next(
+                self._collection(db).aggregate(
+                    [
+                        {"$match": {"store_key": store_key}},
+                        {"$sort": {"chunk": -1}},
+                        {"$limit": 1},
+                        {
+                            "$project": {
+                                "_id": 0,
+                                "chunk": 1,
+                                "size": {"$size": "$users"},
+                            }
+                        },
+                    ]
+                ),
+                None,
+            )
+        if last is None:
+            return None
+        return last["chunk"] * self.chunk_size + last["size"]
+
+    def pick(self, store_key: str, positions: List[int]) -> List[str]:
+        """Entrants at the given positions, only their chunks are read"""
+        chunks = {p // self.chunk_size for p in positions}
+        with self.bot.db as db:
+            found: Dict[int, List[str]] = {
+                doc["chunk"]: doc["users"]
+                for doc in self._collection(db).find(
+                    {"store_key": store_key, "chunk": {"$in": sorted(chunks)}},
+                    {"_id": 0, "chunk": 1, "users": 1},
+                )
+            }
+        return [
+            found[p // self.chunk_size][p % self.chunk_size]
+            for p in positions
+            if p // self.chunk_size in found
+        ]
+
+    @staticmethod
+    def legacy_count() -> dict:
+        """Projection for the size of a giveaway's ``users`` array"""
+        return {"$cond": [{"$isArray": "$users"}, {"$size": "$users"}, None]}
+
+    def legacy_pick(self, giveaway_id, seed: str, positions: List[int]) -> List[str]:
+        """Entrants at the given positions of the order rerolls drew from
+        before :class:`KeyedPermutation`, the ``users`` array shuffled by
+        ``random`` seeded with ``seed``"""
+        with self.bot.db as db:
+            doc = db.giveaways.find_one({"_id": giveaway_id}, {"_id": 0, "users": 1})
+        users = (doc or {}).get("users") or []
+        random.Random(seed).shuffle(users)
+        return [users[p] for p in positions if p < len(users)]
@@ -0,0 +1,188 @@
+import json
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Callable, Optional
+
+from discord.http import handle_message_parameters
+
+from redis.exceptions import ResponseError
+
+# KEYS: giveaway cache, entrants, exit marker
+# ARGV: user id, exit marker ttl, "1" when requirements were already checked
+CLICK_SCRIPT = """
+if ARGV[3] ~= '1' then
+    local raw = redis.call('GET', KEYS[1])
+    if not raw then
+        return {'miss'}
+    end
+    local requirements = cjson.decode(raw)['requirements']
+    if type(requirements) == 'table' and next(requirements) ~= nil then
+        return {'check', raw}
+    end
+end
+
+redis.call('SADD', KEYS[2], ARGV[1])
+local total = redis.call('SCARD', KEYS[2])
+if redis.call('SET', KEYS[3], 1, 'EX', ARGV[2], 'NX') then
+    return {'joined', total}
+end
+return {'leave', total}
+"""
+
+
+class EntryAction(Enum):
+    MISS = "miss"  # giveaway isn't cached, needs loading from mongo
+    CHECK = "check"  # giveaway has requirements to check before joining
+    JOINED = "joined"
+    LEAVE = "leave"  # double click, ask if they want to leave
+
+
+class EntryResult(object):
+    def __init__(self, action: EntryAction, total: int = 0, data: dict = None):
+        self.action = action
+        self.total = total
+        self.data = data
+
+    def __repr__(self):
+        return f"<EntryResult action={self.action} total={self.total}>"
+
+
+class GiveawayEntry(object):
+    """
+    The join/double-click-leave state machine for giveaway buttons.
+
+    A click on a cached giveaway without requirements is a single EVALSHA. When
+    the server doesn't allow scripting it falls back to a GET and a MULTI
+    pipeline, which is still one round trip per step.
+    """
+
+    CACHE_KEY = "db:cache:{}"
+    EXIT_KEY = "cache:{}:exit:{}"
+    CACHE_TTL = 60 * 5
+    EXIT_TTL = 5
+
+    def __init__(self):
+        self.scripting = True
+        self._script = None
+
+    def _keys(self, key: str, user_id):
+        return [self.CACHE_KEY.format(key), key, self.EXIT_KEY.format(key, user_id)]
+
+    def _result(self, reply) -> EntryResult:
+        action = EntryAction(reply[0])
+        if action == EntryAction.CHECK:
+            return EntryResult(action, data=json.loads(reply[1]))
+        if action == EntryAction.MISS:
+            return EntryResult(action)
+        return EntryResult(action, total=int(reply[1]))
+
+    def _eval(self, redis, keys, args) -> Optional[EntryResult]:
+        if not self.scripting:
+            return None
+        if self._script is None:
+            self._script = redis.register_script(CLICK_SCRIPT)
+        try:
+            return self._result(self._script(keys=keys, args=args, client=redis))
+        except ResponseError as e:
+            message = str(e).lower()
+            if "unknown command" not in message and "noperm" not in message:
+                raise
+            # scripting is disabled on this server
+            self.scripting = False
+            return None
+
+    def click(self, redis, key: str, user_id) -> EntryResult:
+        """Joins the giveaway when nothing has to be checked first"""
+        keys = self._keys(key, user_id)
+        if result := self._eval(redis, keys, [user_id, self.EXIT_TTL, "0"]):
+            return result
+
+        raw = redis.get(keys[0])
+        if not raw:
+            return EntryResult(EntryAction.MISS)
+        data = json.loads(raw)
+        if data.get("requirements"):
+            return EntryResult(EntryAction.CHECK, data=data)
+        return self.join(redis, key, user_id)
+
+    def join(self, redis, key: str, user_id) -> EntryResult:
+        """Joins the giveaway unconditionally, requirements must already be checked"""
+        keys = self._keys(key, user_id)
+        if result := self._eval(redis, keys, [user_id, self.EXIT_TTL, "1"]):
+            return result
+
+        pipe = redis.pipeline()
+        pipe.sadd(key, user_id)
+        pipe.scard(key)
+        pipe.set(keys[2], 1, ex=self.EXIT_TTL, nx=True)
+        _, total, fresh = pipe.execute()
+        return EntryResult(
+            EntryAction.JOINED if fresh else EntryAction.LEAVE, total=total
+        )
+
+    def cache(self, redis, key: str, data: dict):
+        redis.set(
+            self.CACHE_KEY.format(key), json.dumps(data, default=str), ex=self.CACHE_TTL
+        )
+
+
+class CountUpdater(object):
+    """
+    Coalesces entry count edits on giveaway messages.
+
+    ``cache:{key}:refresh`` is held for ``interval`` seconds after every edit.
+    A click that takes it shows the count in its own response, clicks while
+    it's held queue one trailing edit on ``giveaway-counts`` for when it runs
+    out, so every click is followed by an edit. The trailing edit is run by the
+    scheduler instead of this instance, which may not get any CPU once it has
+    answered the interaction.
+    """
+
+    LOCK_KEY = "cache:{}:refresh"
+    QUEUE = "giveaway-counts"
+
+    def __init__(self, render: Callable[[str, int], "View"]):
+        self.render = render
+        self.inline = 0
+        self.scheduled = 0
+        self.edits = 0
+
+    @staticmethod
+    def item(key: str, channel_id, message_id) -> str:
+        return f"{key}:{channel_id}:{message_id}"
+
+    def update(self, bot, key: str, message: dict, interval: float) -> bool:
+        """Whether the click should show the count itself, otherwise an edit is
+        queued for the end of the interval"""
+        with bot.redis as redis:
+            if redis.set(
+                self.LOCK_KEY.format(key), 1, nx=True, px=int(interval * 1000)
+            ):
+                self.inline += 1
+                return True
+            item = self.item(key, message["channel_id"], message["id"])
+            redis.zadd(self.QUEUE, {item: time.time() + interval}, nx=True)
+        self.scheduled += 1
+        return False
+
+    def flush(self, bot, item: str, interval: float):
+        """Edits the current count into the message, the ``giveaway-counts`` task"""
+        key, channel_id, message_id = item.split(":")
+        with bot.redis as redis:
+            pipe = redis.pipeline()
+            # clicks in the next interval queue another edit
+            pipe.set(self.LOCK_KEY.format(key), 1, px=int(interval * 1000))
+            pipe.scard(key)
+            _, total = pipe.execute()
+
+        with handle_message_parameters(view=self.render(key, total)) as params:
+            bot.http.edit_message(channel_id, message_id, params=params)
+        self.edits += 1
+
+    @property
+    def stats(self):
+        return {
+            "inline": self.inline,
+            "scheduled": self.scheduled,
+            "edits": self.edits,
+        }
@@ -0,0 +1,68 @@
+import hashlib
+import hmac
+from typing import Iterator, Union
+
+
+class KeyedPermutation(object):
+    """
+    A pseudorandom permutation of ``range(size)`` built from a balanced Feistel
+    network, with cycle walking to bring the power-of-four domain down to
+    ``size``.
+
+    ``permutation[k]`` is the position of the k-th pick and only costs a few
+    hashes, so winners can be drawn without loading or shuffling the entrants.
+    The same key and size always give the same order.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, size: int, key: bytes):
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        self.key = key
+
+        bits = max((size - 1).bit_length(), 2)
+        self.half_bits = (bits + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+
+    @classmethod
+    def for_giveaway(
+        cls, size: int, message_id: Union[str, int], secret: Union[str, bytes]
+    ):
+        """The permutation rerolls use, derived from the giveaway message id and
+        a secret so the order can't be predicted by entrants"""
+        if isinstance(secret, str):
+            secret = secret.encode()
+        key = hmac.new(secret, str(message_id).encode(), hashlib.sha256).digest()
+        return cls(size, key)
+
+    def _round(self, i: int, value: int) -> int:
+        digest = hashlib.blake2b(
+            value.to_bytes(8, "big"), key=self.key, digest_size=8, salt=bytes([i] * 16)
+        ).digest()
+        return int.from_bytes(digest, "big") & self.mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.mask
+        for i in range(self.ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << self.half_bits) | right
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError("permutation index out of range")
+        # the domain is less than 4x the size so this takes a few steps at most
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __iter__(self) -> Iterator[int]:
+        return (self[i] for i in range(self.size))
+
+    def __repr__(self):
+        return f"<KeyedPermutation size={self.size}>"
@@ -1,21 +1,25 @@
-import random
 import uuid
 from datetime import timedelta
 import re
+from types import SimpleNamespace
 from discord.ext import commands
-from discord import AllowedMentions, ButtonStyle, Embed, TextChannel
-from squid.bot import CommandContext, SquidPlugin, command
+from discord import AllowedMentions, ButtonStyle, DiscordException, Embed, TextChannel
+from discord.http import handle_message_parameters
+from squid.bot import CommandContext, SquidPlugin, TaskContext, command
 from squid.bot.checks import has_role
 from squid.bot.errors import CommandFailed
 from squid.models.member import Member
 from squid.utils import discord_timestamp, display_time, now, parse_time, s
-from .views import DonateView, GiveawayView
+from .entrants import Entrants
+from .permutation import KeyedPermutation
+from .views import DonateView, GiveawayView, counts
 import bson
 
 
 class Giveaways(SquidPlugin):
     def __init__(self, bot):
         self.bot = bot
+        self.entrants = Entrants(bot)
         self.link_re = re.compile(
             r"https:\/\/discord.com\/channels\/(\d*)\/(\d*)\/(\d*)"
         )
@@ -25,7 +29,7 @@ class Giveaways(SquidPlugin):
         """Create, Manage, and End Giveaways"""
         ...
 
-    @giveaway.subcommand(name="start")
+    @giveaway.subcommand(name="start", defer=True, ephemeral=True)
     @commands.check(has_role)
     def start(
         self,
@@ -90,11 +94,11 @@ class Giveaways(SquidPlugin):
             prize=prize,
             winners=winners,
             message=message,
-            host=ctx.author,
-            donor=donor or ctx.author,
-            channel=ctx.channel,
-            server=ctx.guild,
-            guild=ctx.guild,
+            host=ctx.deferred("author"),
+            donor=donor or ctx.deferred("author"),
+            channel=ctx.deferred("channel"),
+            server=ctx.deferred("guild"),
+            guild=ctx.deferred("guild"),
         )
 
         data = {}
@@ -178,7 +182,8 @@ class Giveaways(SquidPlugin):
                             "prize": link,
                             "guild_id": str(ctx.guild_id),
                             "end": {"$gte": now()},
-                        }
+                        },
+                        {"message_id": 1},
                     ):
                         message_id = doc["message_id"]
                     else:
@@ -194,6 +199,7 @@ class Giveaways(SquidPlugin):
                     "message_id": str(message_id),
                 },
                 {"$set": {"end": now()}},
+                projection={"store_key": 1},
             ):
                 key = doc["store_key"]
             else:
@@ -201,9 +207,8 @@ class Giveaways(SquidPlugin):
 
         if key:
             with ctx.bot.redis as redis:
-                print("Key:", key)
-                amn = redis.zscore("giveaways", key)
-                redis.zincrby("giveaways", -amn, key)
+                # due right away, a no-op when the scheduler already has it
+                redis.zadd("giveaways", {key: 0}, xx=True)
 
             return ctx.respond(
                 embed=Embed(title="Giveaway Ended", color=self.bot.colors["primary"]),
@@ -212,6 +217,144 @@ class Giveaways(SquidPlugin):
         else:
             raise CommandFailed("Giveaway not found")
 
+    def finish(self, store_key: str):
+        """Ends a giveaway once it's due on the ``giveaways`` queue
+
+        Each step is recorded on the giveaway as it succeeds (``ended_at`` once
+        the winners are picked, then ``message_edited``, ``announced`` and
+        ``notified``) and the giveaway is only flipped inactive after the last
+        one. A retry after a failure picks up from the first step that wasn't
+        recorded, so nothing is lost and nothing that went out is sent twice.
+        """
+        with self.bot.db as db:
+            doc = db.giveaways.find_one({"store_key": store_key}, {"users": 0})
+        if not doc or not doc.get("active", True):
+            return
+
+        ctx = TaskContext(
+            self.bot, self, guild_id=doc["guild_id"], channel_id=doc["channel_id"]
+        )
+
+        if "ended_at" in doc:
+            # the snapshot is already taken, late clicks don't change the winners
+            entrants = self.entrants.count(store_key) or 0
+        else:
+            with self.bot.redis as redis:
+                entrants = self.entrants.write(
+                    store_key, redis.sscan_iter(store_key, count=1000)
+                )
+
+        winners = []
+        if entrants:
+            order = KeyedPermutation.for_giveaway(
+                entrants, doc["message_id"], self.bot.http.token
+            )
+            winners = self.entrants.pick(
+                store_key, [order[i] for i in range(min(int(doc["winners"]), entrants))]
+            )
+
+        if "ended_at" not in doc:
+            self._record(doc, ended_at=now(), next_user_seed_input=len(winners))
+
+        guild = ctx.guild
+        host = guild and guild.get_member(int(doc["host_id"]))
+        winner_str = ", ".join(f"<@{i}>" for i in winners) or "Nobody"
+        message = SimpleNamespace(
+            id=doc["message_id"],
+            jump_url=f"https://discord.com/channels/{doc['guild_id']}/{doc['channel_id']}/{doc['message_id']}",
+        )
+        seed = dict(
+            winners=winner_str,
+            prize=doc["prize"],
+            requirements="\n".join(
+                self.bot.requirements[k].display(v)
+                for k, v in doc.get("requirements", {}).items()
+                if k in self.bot.requirements
+            ),
+            host=host or f"<@{doc['host_id']}>",
+            message=message,
+            channel=ctx.deferred("channel"),
+            server=guild,
+            guild=guild,
+        )
+
+        if not doc.get("message_edited"):
+            with handle_message_parameters(
+                embed=Embed(
+                    title=doc["prize"],
+                    description=ctx.setting("end_description", **seed),
+                    timestamp=doc["end"],
+                    color=self.bot.colors["secondary"],
+                ).set_footer(text=f"{entrants} entrant{s(entrants)} | Ended at "),
+                view=GiveawayView(key=store_key, label=entrants, disabled=True),
+            ) as params:
+                self.bot.http.edit_message(
+                    doc["channel_id"], doc["message_id"], params=params
+                )
+            self._record(doc, message_edited=True)
+
+        if not doc.get("announced"):
+            ctx.send(
+                ctx.setting("end_message", **seed),
+                allowed_mentions=AllowedMentions(
+                    everyone=False, roles=False, users=True
+                ),
+            )
+            self._record(doc, announced=True)
+
+        if not doc.get("notified"):
+            if winners and ctx.setting("dm_winner") and guild:
+                content = ctx.setting("winner_message", **seed)
+                for user_id in winners:
+                    if member := guild.get_member(int(user_id)):
+                        try:
+                            member.send(
+                                embed=Embed(
+                                    description=content,
+                                    color=self.bot.colors["primary"],
+                                )
+                            )
+                        except DiscordException:
+                            pass  # closed dms
+
+            if host and ctx.setting("dm_host"):
+                try:
+                    host.send(
+                        embed=Embed(
+                            title="Giveaway Ended",
+                            description=f"Your giveaway for [{doc['prize']}]({message.jump_url}) has ended\nWinners: {winner_str}",
+                            color=self.bot.colors["primary"],
+                        )
+                    )
+                except DiscordException:
+                    pass
+            self._record(doc, notified=True)
+
+        self._record(doc, active=False)
+        with self.bot.redis as redis:
+            pipe = redis.pipeline()
+            pipe.delete(f"db:cache:{store_key}")
+            # late clicks still land here, kept a while for debugging
+            pipe.expire(store_key, 60 * 60 * 24)
+            pipe.execute()
+
+    def _record(self, doc: dict, **progress):
+        """Stores how far :meth:`finish` got on the giveaway"""
+        with self.bot.db as db:
+            db.giveaways.update_one({"_id": doc["_id"]}, {"$set": progress})
+        doc.update(progress)
+
+    def update_count(self, item: str):
+        """Edits the entry count in after a burst of clicks, see
+        :class:`CountUpdater`"""
+        key = item.split(":", 1)[0]
+        with self.bot.db as db:
+            if not db.giveaways.count_documents(
+                {"store_key": key, "ended_at": {"$exists": False}}, limit=1
+            ):
+                return  # ended, the message shows the results now
+        counts.flush(self.bot, item, self.bot.giveaway_update_interval)
+
     @giveaway.subcommand(name="reroll")
     @commands.check(has_role)
     def reroll(self, ctx: CommandContext, link: str, amount: int = 1) -> None:
@@ -223,7 +366,8 @@ class Giveaways(SquidPlugin):
             else:
                 with ctx.bot.db as db:
                     if doc := db.giveaways.find_one(
-                        {"prize": link, "guild_id": str(ctx.guild_id)}
+                        {"prize": link, "guild_id": str(ctx.guild_id)},
+                        {"message_id": 1},
                     ):
                         message_id = doc["message_id"]
                     else:
@@ -234,28 +378,62 @@ class Giveaways(SquidPlugin):
         if amount > 80:
             raise CommandFailed("You cannot reroll more than 80 users at a time")
         with ctx.bot.db as db:
-            doc = db.giveaways.find_one({"message_id": message_id}) or {}
+            # entrants never come back with the giveaway, only their count
+            doc = next(
+                db.giveaways.aggregate(
+                    [
+                        {"$match": {"message_id": message_id}},
+                        {"$limit": 1},
+                        {
+                            "$project": {
+                                "store_key": 1,
+                                "channel_id": 1,
+                                "message_id": 1,
+                                "prize": 1,
+                                "next_user_seed_input": 1,
+                                "legacy_entrants": self.entrants.legacy_count(),
+                            }
+                        },
+                    ]
+                ),
+                {},
+            )
 
-            if "users" not in doc:
+            if not doc:
                 raise CommandFailed("Giveaway has no entrants or hasn't ended")
 
-            users = doc.get("users", [])
+            legacy = False
+            if (entrants := self.entrants.count(doc["store_key"])) is None:
+                entrants = doc.get("legacy_entrants")
+                legacy = True
 
-            random.seed(f'{doc["message_id"]}{self.bot.http.token}')
-            random.shuffle(users)
+            if entrants is None:
+                raise CommandFailed("Giveaway has no entrants or hasn't ended")
 
             next_val = doc.get("next_user_seed_input", 0)
 
             winners = []
-
-            while users and len(winners) < amount:
-                user = users[int(next_val % len(users))]
-                next_val += 1
-
-                winners.append(user)
+            if entrants:
+                positions = [(next_val + i) % entrants for i in range(amount)]
+                next_val += len(positions)
+
+                if legacy:
+                    # keeps the order its earlier rerolls were drawn from
+                    winners = self.entrants.legacy_pick(
+                        doc["_id"],
+                        f'{doc["message_id"]}{self.bot.http.token}',
+                        positions,
+                    )
+                else:
+                    order = KeyedPermutation.for_giveaway(
+                        entrants, doc["message_id"], self.bot.http.token
+                    )
+                    winners = self.entrants.pick(
+                        doc["store_key"], [order[p] for p in positions]
+                    )
 
             if next_val != 0:
-                db.giveaways.find_one_and_update(
+                db.giveaways.update_one(
                     {"_id": doc["_id"]},
                     {"$set": {"next_user_seed_input": next_val}},
                 )
@@ -268,10 +446,10 @@ class Giveaways(SquidPlugin):
             reroll_message = ctx.setting(
                 "reroll_message",
                 host=f"<@{ctx.author.id}>",
-                reroller=ctx.author,
-                reroll_channel=ctx.channel,
-                server=ctx.guild,
-                channel=ctx.channel,
+                reroller=ctx.deferred("author"),
+                reroll_channel=ctx.deferred("channel"),
+                server=ctx.deferred("guild"),
+                channel=ctx.deferred("channel"),
                 link=f"https://discordapp.com/channels/{ctx.guild_id}/{doc['channel_id']}/{doc['message_id']}",
                 winners=(winner_str or "Nobody"),
                 prize=doc["prize"],
@@ -304,7 +482,14 @@ class Giveaways(SquidPlugin):
                         {
                             "$group": {
                                 "_id": "$channel_id",
-                                "giveaways": {"$push": "$$ROOT"},
+                                "giveaways": {
+                                    "$push": {
+                                        "store_key": "$store_key",
+                                        "message_id": "$message_id",
+                                        "prize": "$prize",
+                                        "end": "$end",
+                                    }
+                                },
                             }
                         },
                         {"$project": {"_id": 0, "channel_id": "$_id", "giveaways": 1}},
@@ -413,11 +598,11 @@ class Giveaways(SquidPlugin):
             **requirements,
             prize=prize,
             winners=winners,
-            host=ctx.author,
-            donor=ctx.author,
-            channel=ctx.channel,
-            server=ctx.guild,
-            guild=ctx.guild,
+            host=ctx.deferred("author"),
+            donor=ctx.deferred("author"),
+            channel=ctx.deferred("channel"),
+            server=ctx.deferred("guild"),
+            guild=ctx.deferred("guild"),
         )
 
         # verify that the output has been configured
@@ -462,5 +647,7 @@ class Giveaways(SquidPlugin):
 
 
 def setup(bot):
-    bot.add_plugin(Giveaways(bot))
+    plugin = bot.add_plugin(Giveaways(bot))
+    bot.add_task("giveaways", plugin.finish)
+    bot.add_task(counts.QUEUE, plugin.update_count)
     bot.add_handler(GiveawayView)
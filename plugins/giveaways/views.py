@@ -1,5 +1,11 @@
 from datetime import datetime
-import json
+from typing import Optional
+from plugins.giveaways.entry import (
+    CountUpdater,
+    EntryAction,
+    EntryResult,
+    GiveawayEntry,
+)
 from plugins.giveaways.requirement import RequirementPriority
 from squid.models.abc import Messageable
 from squid.models.interaction import InteractionResponse
@@ -11,6 +17,9 @@ from discord.ui import Button
 
 from squid.utils import display_time, now, parse_time, s
 
+entries = GiveawayEntry()
+counts = CountUpdater(lambda key, total: GiveawayView(label=total, key=key))
+
 
 class C(Messageable):
     def __init__(self, *, state, http, channel_id):
@@ -59,6 +68,9 @@ class ManageEntryView(View):
 
 class GiveawayView(View):
     KEY = "giveaway-store"
+    # a click is one redis round trip, only requirement checks (which can call
+    # amari/mee6) go through the deferral pool
+    INLINE = True
 
     def __init__(self, *a, key: str, **k):
         super().__init__()
@@ -72,16 +84,23 @@ class GiveawayView(View):
         key: str,
     ):
         with ctx.bot.redis as redis:
+            result = entries.click(redis, key, ctx.author.id)
 
-            if raw_data := redis.get(f"db:cache:{key}"):
-                data = json.loads(raw_data)
-            else:
+            if result.action == EntryAction.MISS:
                 with ctx.bot.db as db:
-                    data = db.giveaways.find_one({"store_key": key})
-                    if data:
-                        redis.set(f"db:cache:{key}", json.dumps(data, default=str))
-                        redis.expire(f"db:cache:{key}", 60 * 5)  # 5 minutes
+                    data = db.giveaways.find_one({"store_key": key}, {"users": 0})
+                if data:
+                    entries.cache(redis, key, data)
+                result = EntryResult(EntryAction.CHECK, data=data)
 
+        if result.action == EntryAction.CHECK:
+            return ctx.bot.respond_in_time(
+                ctx, lambda ctx: GiveawayView.check(ctx, key, result.data)
+            )
+        return GiveawayView.entered(ctx, key, result)
+
+    @staticmethod
+    def check(ctx: ComponentContext, key: str, data: Optional[dict]):
         requirements = []
         for name, data in (data or {}).get("requirements", {}).items():
             if req := ctx.bot.requirements.get(name, None):
@@ -103,26 +122,35 @@ class GiveawayView(View):
             if requirement.priority == RequirementPriority.OVERRIDE and response.valid:
                 break
 
-        with ctx.bot.redis as db:
-            db.sadd(key, ctx.author.id)
-            total = db.scard(key)
+        with ctx.bot.redis as redis:
+            result = entries.join(redis, key, ctx.author.id)
+        return GiveawayView.entered(ctx, key, result)
 
-            if db.exists(f"cache:{key}:exit:{ctx.author.id}"):
-                return InteractionResponse.channel_message(
-                    embed=Embed(
-                        description="Do you want to leave this giveaway?",
-                        color=ctx.bot.colors["secondary"],
-                    ).set_footer(
-                        text="You can leave giveaways by double-clicking the join button"
-                    ),
-                    ephemeral=True,
-                    components=ManageEntryView(key=key).to_components(),
-                )
-            else:
-                db.set(f"cache:{key}:exit:{ctx.author.id}", 1, ex=5)
+    @staticmethod
+    def entered(ctx: ComponentContext, key: str, result: EntryResult):
+        if result.action == EntryAction.LEAVE:
+            return InteractionResponse.channel_message(
+                embed=Embed(
+                    description="Do you want to leave this giveaway?",
+                    color=ctx.bot.colors["secondary"],
+                ).set_footer(
+                    text="You can leave giveaways by double-clicking the join button"
+                ),
+                ephemeral=True,
+                components=ManageEntryView(key=key).to_components(),
+            )
+
+        interval = ctx.bot.giveaway_update_interval
+        if (
+            interval
+            and ctx._message
+            and not counts.update(ctx.bot, key, ctx._message, interval)
+        ):
+            # the count is edited in by the queued update, just acknowledge
+            return InteractionResponse.defferred_message_update()
 
         return InteractionResponse.message_update(
-            components=GiveawayView(label=total, key=key).to_components()
+            components=GiveawayView(label=result.total, key=key).to_components()
         )
 
 
@@ -210,11 +238,11 @@ class DonateView(View):
                 **doc["requirements"],
                 prize=doc["prize"],
                 winners=doc["winners"],
-                host=ctx.author,
+                host=ctx.deferred("author"),
                 donor=donor,
                 channel=donor_channel,
-                server=ctx.guild,
-                guild=ctx.guild,
+                server=ctx.deferred("guild"),
+                guild=ctx.deferred("guild"),
             )
 
             message = donor_channel.send(
@@ -1,7 +1,6 @@
 from discord import Embed, user
 from squid.models import InteractionResponse
 from squid.bot import command, SquidPlugin
-import expr
 
 
 class InviteCounting(SquidPlugin):
@@ -1,6 +1,8 @@
 from discord import Embed
 from squid.bot import command, SquidPlugin
-import expr
+from squid.models.functions import lazy_import
+
+expr = lazy_import("expr")
 
 
 class MathSolving(SquidPlugin):
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, FrozenSet, Optional, Tuple
+
+from squid.models.tags import Tag
+
+if TYPE_CHECKING:
+    from squid.bot import SquidBot
+
+
+class TagCache(object):
+    """
+    Resolves tag names without touching mongo for names that aren't tags.
+
+    Each guild has a set of its tag names in redis (``tags:index:{guild_id}``)
+    mirrored in-process, and decoded :class:`Tag` objects are kept in an LRU.
+    Everything is stamped with ``tags:version:{guild_id}``, anything that
+    writes tags should call :meth:`invalidate` (or ``INCR`` the version and
+    delete the index itself) for the edit to show on the next lookup. Nothing
+    does yet (the dashboard writes tags straight to mongo), so an edited tag
+    is served from cache for up to ``ttl`` seconds, 30 by default, the same as
+    guild settings. A name missing from the index is still looked up in mongo,
+    and a name that isn't a tag is only remembered for ``negative_ttl``
+    seconds.
+    """
+
+    INDEX_KEY = "tags:index:{}"
+    VERSION_KEY = "tags:version:{}"
+    # marks an index as built so guilds without tags aren't rebuilt every time
+    BUILT = ""
+
+    def __init__(
+        self,
+        bot: "SquidBot",
+        *,
+        size_limit=1024,
+        ttl=30.0,
+        index_ttl=86400,
+        negative_ttl=30.0,
+    ):
+        self.bot = bot
+        self.size_limit = size_limit
+        self.ttl = ttl
+        self.index_ttl = index_ttl
+        self.negative_ttl = negative_ttl
+
+        self._indexes = OrderedDict()
+        self._tags = OrderedDict()
+        self._missing = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, store: OrderedDict, key, version):
+        with self._lock:
+            entry = store.get(key)
+            if entry is None:
+                return None
+            expires, stamp, value = entry
+            if expires < time.monotonic() or stamp != version:
+                del store[key]
+                return None
+            store.move_to_end(key)
+            return value
+
+    def _store(self, store: OrderedDict, key, version, value, ttl=None):
+        with self._lock:
+            store[key] = (time.monotonic() + (ttl or self.ttl), version, value)
+            store.move_to_end(key)
+            while len(store) > self.size_limit:
+                store.popitem(last=False)
+
+    def _build_index(self, guild_id: str) -> FrozenSet[str]:
+        with self.bot.db as db:
+            names = db.tags.distinct("name", {"guild_id": guild_id})
+
+        key = self.INDEX_KEY.format(guild_id)
+        with self.bot.redis as redis:
+            pipe = redis.pipeline()
+            pipe.sadd(key, self.BUILT, *names)
+            pipe.expire(key, self.index_ttl)
+            pipe.execute()
+        return frozenset(names)
+
+    def _index(self, guild_id: str) -> Tuple[Optional[str], FrozenSet[str]]:
+        with self.bot.redis as redis:
+            version = redis.get(self.VERSION_KEY.format(guild_id))
+
+            if (names := self._cached(self._indexes, guild_id, version)) is not None:
+                return version, names
+
+            members = redis.smembers(self.INDEX_KEY.format(guild_id))
+
+        if self.BUILT in members:
+            names = frozenset(members - {self.BUILT})
+        else:
+            names = self._build_index(guild_id)
+
+        self._store(self._indexes, guild_id, version, names)
+        return version, names
+
+    def _add_to_index(self, guild_id: str, name: str):
+        with self.bot.redis as redis:
+            redis.sadd(self.INDEX_KEY.format(guild_id), name)
+        with self._lock:
+            self._indexes.pop(guild_id, None)
+
+    def get(self, name: str, guild_id) -> Optional[Tag]:
+        guild_id = str(guild_id)
+        key = (guild_id, name)
+        version, names = self._index(guild_id)
+        if name in names:
+            if (tag := self._cached(self._tags, key, version)) is not None:
+                return tag
+        elif self._cached(self._missing, key, version) is not None:
+            return None
+
+        with self.bot.db as db:
+            data = db.tags.find_one(dict(name=name, guild_id=guild_id))
+
+        if data is None:
+            if name in names:
+                # the index is out of date, rebuilt on the next lookup
+                self.invalidate(guild_id)
+            else:
+                self._store(self._missing, key, version, True, self.negative_ttl)
+            return None
+
+        if name not in names:
+            # created somewhere that didn't invalidate the index
+            self._add_to_index(guild_id, name)
+
+        tag = Tag(state=self.bot.state, data=data)
+        self._store(self._tags, key, version, tag)
+        return tag
+
+    def invalidate(self, guild_id):
+        """Call after creating, editing or deleting a tag in the guild"""
+        guild_id = str(guild_id)
+        with self.bot.redis as redis:
+            pipe = redis.pipeline()
+            pipe.incr(self.VERSION_KEY.format(guild_id))
+            pipe.delete(self.INDEX_KEY.format(guild_id))
+            pipe.execute()
+
+        with self._lock:
+            self._indexes.pop(guild_id, None)
+            for store in (self._tags, self._missing):
+                for key in [k for k in store if k[0] == guild_id]:
+                    del store[key]
@@ -11,11 +11,15 @@ from squid.models.interaction import (
     Interaction,
 )
 from squid.models.tags import Tag, TagArgument
+from squid.tagscript import CompiledInterpreter
 import TagScriptEngine as tse
 from .blocks import stable_blocks
-from fuzzywuzzy import process
+from .cache import TagCache
+from squid.models.functions import lazy_import
 from copy import copy
 
+process = lazy_import("fuzzywuzzy.process")
+
 
 class Tags(SquidPlugin):
     def __init__(self, bot):
@@ -45,7 +49,8 @@ class Tags(SquidPlugin):
             # tse.JoinBlock(),
         ]
 
-        self.engine = tse.Interpreter(blocks=blocks)
+        self.engine = CompiledInterpreter(blocks=blocks)
+        self.cache = TagCache(bot)
 
     @staticmethod
     def proper_cast(v: ApplicationCommandOptionType, k):
@@ -64,10 +69,7 @@ class Tags(SquidPlugin):
         self.bot._get_command = self._og_get
 
     def get_tag(self, name: str, guild_id: int):
-        with self.bot.db as db:
-            if data := db.tags.find_one(dict(name=name, guild_id=str(guild_id))):
-                return Tag(state=self.bot.state, data=data)
-        return None
+        return self.cache.get(name, guild_id)
 
     def get_command(self, interaction: "Interaction", cmd: "ApplicationCommand"):
         """Get the actual name of the command including subcommands
@@ -94,21 +96,32 @@ class Tags(SquidPlugin):
     def handle_tag(
         self, ctx: CommandContext, tag: Tag, data: Dict[str, TagArgument] = None, **kw
     ):
-        seed = {
-            "author": self.proper_cast(ApplicationCommandOptionType.user, ctx.author),
-            "user": self.proper_cast(ApplicationCommandOptionType.user, ctx.author),
-            "channel": self.proper_cast(
+        # only hydrating the discord objects the tagscript actually references
+        references = self.engine.references(tag.tagscript)
+
+        def referenced(*names):
+            return references is None or any(n in references for n in names)
+
+        seed = {}
+        if referenced("author", "user", "target"):
+            seed["author"] = seed["user"] = self.proper_cast(
+                ApplicationCommandOptionType.user, ctx.author
+            )
+        if referenced("channel"):
+            seed["channel"] = self.proper_cast(
                 ApplicationCommandOptionType.channel, ctx.channel
-            ),
-            "guild": tse.AttributeAdapter(ctx.guild),
-            "server": tse.AttributeAdapter(ctx.guild),
-            **{
+            )
+        if referenced("guild", "server"):
+            seed["guild"] = seed["server"] = tse.AttributeAdapter(ctx.guild)
+
+        seed.update(
+            {
                 v: self.proper_cast(opt.type, k)
                 for opt, (v, k) in zip(tag.options, data.items())
-            },
-        }
+            }
+        )
 
-        if "target" not in seed:
+        if "target" not in seed and "author" in seed:
             seed["target"] = seed["author"]
 
         with ctx.bot.redis as redis:
@@ -176,18 +189,16 @@ class Tags(SquidPlugin):
                                 arg_values.append(parts.pop(0))
                         if arg_name and arg_values:
                             args[arg_name] = " ".join(arg_values)
+                        to_invoke = self.bot.find_command(name)
                     else:
-
                         args = command.split(" ")
-                        a = list(args)
-                        cmd = None
-                        for i, _ in enumerate(args):
-                            if c := self._og_get(None, None, names=a[: i + 1]):
-                                cmd = c
-                                name = a[: i + 1]
-                                args = a[i + 1 :]
-
-                    to_invoke = self._og_get(None, None, names=name)
+                        to_invoke, depth = self.bot.match_command(args)
+                        name, args = args[:depth], args[depth:]
+
+                    if to_invoke is None:
+                        return ctx.respond(
+                            content=f"Unknown command: {command}", ephemeral=True
+                        )
                     builder = CreateApplicationCommand.from_command(to_invoke)
                     base_options = builder.options
                     if type(args) == dict:
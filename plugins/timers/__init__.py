@@ -3,5 +3,6 @@ from .views import ReminderView
 
 
 def setup(bot):
-    bot.add_plugin(Timers(bot))
+    plugin = bot.add_plugin(Timers(bot))
+    bot.add_task("timers", plugin.finish)
     bot.add_handler(ReminderView)
@@ -4,18 +4,20 @@ import re
 import uuid
 from datetime import timedelta
 from discord import ButtonStyle, Color, Embed
-from squid.bot import CommandContext, SquidPlugin, command
+from squid.bot import CommandContext, SquidPlugin, TaskContext, command
 from squid.bot.errors import CommandFailed
 from squid.models.interaction import InteractionResponse
 from squid.utils import discord_timestamp, now, parse_time
 from squid.bot.checks import has_role
 from discord.ext import commands
+from .reminders import ReminderFanout
 from .views import ReminderView
 
 
 class Timers(SquidPlugin):
     def __init__(self, bot):
         self.bot = bot
+        self.reminders = ReminderFanout(bot)
         self.link_re = re.compile(
             r"https:\/\/(?:canary\.)?discord.com\/channels\/(\d*)\/(\d*)\/(\d*)"
         )
@@ -52,8 +54,8 @@ class Timers(SquidPlugin):
             time=f"<t:{stamp}:R>",
             stamp=stamp,
             title=title,
-            author=ctx.author,
-            channel=ctx.channel,
+            author=ctx.deferred("author"),
+            channel=ctx.deferred("channel"),
         )
         message = ctx.send(
             embed=Embed(
@@ -100,6 +102,45 @@ class Timers(SquidPlugin):
             ephemeral=True,
         )
 
+    def finish(self, store_key: str):
+        """Ends a timer once it's due on the ``timers`` queue
+
+        ``announced`` and ``reminded`` are recorded on the timer as each step
+        succeeds and it's only flipped inactive after both, so a retry finishes
+        what a failed run didn't without posting the end message twice.
+        """
+        with self.bot.db as db:
+            doc = db.timers.find_one({"store_key": store_key, "active": True})
+
+        key = f"timers:{store_key}"
+        if doc:
+            ctx = TaskContext(
+                self.bot, self, guild_id=doc["guild_id"], channel_id=doc["channel_id"]
+            )
+            embed = Embed(
+                description=doc["end_message"], color=self.bot.colors["primary"]
+            ).set_author(name=doc["title"], icon_url=doc.get("icon_url"))
+            if not doc.get("announced"):
+                ctx.send(embed=embed)
+                self._record(doc, announced=True)
+
+            if not doc.get("reminded"):
+                if ctx.setting("reminder"):
+                    embed.description += f"\n[Jump to timer](https://discord.com/channels/{doc['guild_id']}/{doc['channel_id']}/{doc['message_id']})"
+                    self.reminders.notify(doc["channel_id"], key, embed=embed)
+                self._record(doc, reminded=True)
+
+            self._record(doc, active=False)
+
+        with self.bot.redis as redis:
+            redis.delete(key)
+
+    def _record(self, doc: dict, **progress):
+        """Stores how far :meth:`finish` got on the timer"""
+        with self.bot.db as db:
+            db.timers.update_one({"_id": doc["_id"]}, {"$set": progress})
+        doc.update(progress)
+
     @timer.subcommand(name="list")
     def list(self, ctx, user=None, channel=None) -> Embed:
         """
@@ -188,8 +229,8 @@ class Timers(SquidPlugin):
             raise CommandFailed("I cannot find that timer")
         else:
             with ctx.bot.redis as redis:
-                amount = redis.zscore("timers", key)
-                redis.zincrby("timers", -amount, key)
+                # due right away, a no-op when the scheduler already has it
+                redis.zadd("timers", {key: 0}, xx=True)
 
             return ctx.respond(
                 embed=Embed(title="Timer Ended", color=self.bot.colors["primary"]),
@@ -229,8 +270,8 @@ class Timers(SquidPlugin):
             raise CommandFailed("I cannot find that timer")
         else:
             with ctx.bot.redis as redis:
-                amount = redis.zscore("timers", key)
-                redis.zincrby("timers", -amount, key)
+                # due right away, a no-op when the scheduler already has it
+                redis.zadd("timers", {key: 0}, xx=True)
 
             return ctx.respond(
                 embed=Embed(title="Timer Ended", color=self.bot.colors["primary"]),
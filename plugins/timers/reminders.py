@@ -0,0 +1,82 @@
+import logging
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Tuple
+
+from discord import AllowedMentions, DiscordException, Embed
+from discord.http import handle_message_parameters
+
+if TYPE_CHECKING:
+    from squid.bot import SquidBot
+
+log = logging.getLogger(__name__)
+
+
+class ReminderFanout(object):
+    """
+    Pings everyone in a timer's reminder set.
+
+    Mentions are packed into as few messages as ``limit`` allows and posted in
+    the timer's channel. If the channel can't be posted in, the remaining users
+    are DM'd instead through their cached DM channels. The http client's rate
+    limiter paces both from the buckets discord reports.
+    """
+
+    MENTIONS = AllowedMentions(everyone=False, roles=False, users=True)
+
+    def __init__(self, bot: "SquidBot", *, limit=2000):
+        self.bot = bot
+        self.limit = limit
+
+    @staticmethod
+    def pack(user_ids: Iterable, limit=2000) -> Iterator[Tuple[List[str], str]]:
+        """Groups user ids into messages of mentions no longer than ``limit``"""
+        batch, length = [], 0
+        for user_id in user_ids:
+            mention = f"<@{user_id}>"
+            if batch and length + 1 + len(mention) > limit:
+                yield batch, " ".join(f"<@{u}>" for u in batch)
+                batch, length = [], 0
+            length += len(mention) + (1 if batch else 0)
+            batch.append(str(user_id))
+        if batch:
+            yield batch, " ".join(f"<@{u}>" for u in batch)
+
+    def _send(self, channel_id, **kwargs):
+        with handle_message_parameters(**kwargs) as params:
+            return self.bot.http.send_message(channel_id, params=params)
+
+    def notify(self, channel_id, key: str, *, embed: Embed) -> dict:
+        """Pings every user in the ``key`` set, ``embed`` is what they're
+        DM'd if the channel is unavailable"""
+        stats = {"messages": 0, "mentions": 0, "dms": 0, "failed": 0}
+        dm = False
+
+        with self.bot.redis as redis:
+            for users, content in self.pack(
+                redis.sscan_iter(key, count=1000), self.limit
+            ):
+                if not dm:
+                    try:
+                        self._send(
+                            channel_id, content=content, allowed_mentions=self.MENTIONS
+                        )
+                    except DiscordException:
+                        log.warning(
+                            "Unable to ping reminders in %s, sending dms",
+                            channel_id,
+                            exc_info=True,
+                        )
+                        dm = True
+                    else:
+                        stats["messages"] += 1
+                        stats["mentions"] += len(users)
+                        continue
+
+                for user_id in users:
+                    try:
+                        self._send(self.bot.state.dm_channel_id(user_id), embed=embed)
+                    except DiscordException:
+                        stats["failed"] += 1  # closed dms
+                    else:
+                        stats["dms"] += 1
+
+        return stats
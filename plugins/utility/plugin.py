@@ -4,7 +4,6 @@ import shlex
 import traceback
 from discord import Color, Embed
 import json
-from plugins.giveaways.views import C
 from squid.bot import command, SquidPlugin, CommandContext
 import inspect
 from discord.http import Route
@@ -30,7 +29,7 @@ class Utility(SquidPlugin):  # todo fill in cog
             ephemeral=False,
         )
 
-    @command(ignore_register=True)
+    @command(ignore_register=True, defer=True)
     def register(self, ctx: CommandContext, command: str = None):
         """Registers commands"""
         if ctx.author.id != ctx.bot.owner_id:
@@ -1,4 +1,4 @@
 from .plugin import SquidPlugin
 from .bot import SquidBot
 from .command import SquidCommand, command
-from .context import CommandContext, ComponentContext
+from .context import CommandContext, ComponentContext, TaskContext
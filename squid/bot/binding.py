@@ -0,0 +1,68 @@
+import inspect
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
+
+from squid.models.enums import ApplicationCommandOptionType
+
+if TYPE_CHECKING:
+    from squid.bot.context import CommandContext
+    from squid.models.interaction import ApplicationCommandOption
+
+__all__ = ("ArgumentBinder",)
+
+Converter = Callable[["CommandContext", Any], Any]
+
+SUBCOMMANDS = (
+    ApplicationCommandOptionType.sub_command,
+    ApplicationCommandOptionType.sub_command_group,
+)
+
+# STRING 3, INTEGER 4 (any integer between -2^53 and 2^53), BOOLEAN 5, USER 6,
+# CHANNEL 7 (all channel types + categories), ROLE 8, MENTIONABLE 9 (users and
+# roles), NUMBER 10 (any double between -2^53 and 2^53)
+CONVERTERS: Dict[ApplicationCommandOptionType, Converter] = {
+    ApplicationCommandOptionType.string: lambda ctx, v: str(v),
+    ApplicationCommandOptionType.integer: lambda ctx, v: int(v),
+    ApplicationCommandOptionType.boolean: lambda ctx, v: bool(v),
+    ApplicationCommandOptionType.user: lambda ctx, v: ctx._resolve_id("user")(v),
+    ApplicationCommandOptionType.channel: lambda ctx, v: ctx._resolve_id("channel")(v),
+    ApplicationCommandOptionType.role: lambda ctx, v: ctx._resolve_id("role")(v),
+    # TODO: resolve to proper types
+    ApplicationCommandOptionType.mentionable: lambda ctx, v: ctx._resolve_id("user")(v),
+    ApplicationCommandOptionType.number: lambda ctx, v: int(v),
+}
+
+
+class ArgumentBinder(object):
+    """
+    Turns a command's options into its callback's keyword arguments.
+
+    The callback's defaults are worked out once from its signature and each
+    option is converted by its own type through :data:`CONVERTERS`.
+    """
+
+    def __init__(self, params: Dict[str, inspect.Parameter]):
+        self.defaults = {
+            name: param.default
+            for name, param in params.items()
+            if name not in ("self", "ctx")
+            and param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY)
+            and param.default is not param.empty
+        }
+
+    def bind(
+        self, ctx: "CommandContext", options: List["ApplicationCommandOption"]
+    ) -> Dict[str, Any]:
+        kwargs = dict(self.defaults)
+        for option in options:
+            if option.type in SUBCOMMANDS or option.value is None:
+                continue
+
+            converter = CONVERTERS.get(option.type)
+            value = option.value
+            kwargs[option.name] = (
+                converter(ctx, value) if converter and value else value
+            )
+        return kwargs
+
+    def __repr__(self):
+        return f"<ArgumentBinder defaults={self.defaults!r}>"
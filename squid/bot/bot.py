@@ -1,9 +1,13 @@
+from contextlib import nullcontext
 from functools import wraps
+import importlib
+import logging
+import sys
+import threading
+import time
 import traceback
-from typing import TYPE_CHECKING, Callable, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 from flask import jsonify
-import sentry_sdk
-from expr.errors import Gibberish, NumberOverflow, UnknownPointer
 import requests
 from squid.bot.errors import CheckFailure, CommandFailed, SquidError
 from squid.models.commands import CreateApplicationCommand
@@ -14,16 +18,45 @@ from squid.models.interaction import (
     InteractionResponse,
 )
 from squid.http import HttpClient
+from squid.http.ratelimit import RedisRateLimiter
 from squid.models.views import View
 from squid.bot.state import State
+from squid.bot.connection import ManagedRedis
+from squid.bot.deferral import Deferral
+from squid.bot.manifest import Manifest
+from squid.bot.routing import CommandTrie
 from .command import SquidCommand
 from discord import Component, Embed, Color
 from .plugin import SquidPlugin
 from discord import SyncWebhook as Webhook
-from squid.models.functions import Lazy
+from squid.models.functions import Lazy, lazy_import
 from .context import CommandContext, ComponentContext, SquidContext
 from squid.flask_support import flask_compat
 from discord import InteractionType
+from discord.http import Route
+
+log = logging.getLogger(__name__)
+
+# only needed to tell math errors apart
+expr_errors = lazy_import("expr.errors")
+
+
+def set_sentry_context(key: str, value: dict):
+    # sentry is only imported (and initialized) by main when it's configured
+    if (sentry_sdk := sys.modules.get("sentry_sdk")) is not None:
+        sentry_sdk.set_context(key, value)
+
+
+# serialized once, these never change
+PONG = InteractionResponse.pong().freeze()
+UNKNOWN_COMPONENT = InteractionResponse.channel_message(
+    embed=Embed(
+        title="Unknown Component",
+        description="This issue will be fixed soon ;(",
+        color=Color.red(),
+    ),
+    ephemeral=True,
+).freeze()
 
 
 class SquidBot(object):
@@ -51,15 +84,34 @@ class SquidBot(object):
 
         self.session = requests.Session()
 
-        self.http = HttpClient(token, session=self.session)
+        self.http = HttpClient(
+            token,
+            session=self.session,
+            # shared with every other instance through redis
+            ratelimits=RedisRateLimiter(redis) if redis is not None else None,
+        )
 
         self.state = State(self, self.redis)
+        self.deferral = Deferral(self)
         self.__plugins = {}
 
         self._commands = {}
+        self._routes = CommandTrie()
         self._handlers = {}
+        self._tasks = {}
         self._checks = []
 
+        # extensions listed in a manifest are only imported once they're used
+        self._extensions = set()
+        self._extension_lock = threading.RLock()
+        self._deferred = {"commands": {}, "handlers": {}, "tasks": {}, "plugins": {}}
+        self._routers = []
+
+        # seconds after receipt before a slow handler's response is deferred,
+        # inside discord's 3s limit. ``None`` turns it off, then only handlers
+        # marked ``defer`` or with a budget go through the deferral pool
+        self.response_deadline: Optional[float] = 2.2
+
         self.__dict__.update(
             {k[6:]: v for k, v in attrs.items() if k.startswith("squid_")}
         )
@@ -74,8 +126,43 @@ class SquidBot(object):
     def webhook(self, application_id, interaction_token):
         return Lazy(Webhook.partial, application_id, interaction_token)
 
+    def load_extension(self, name: str) -> None:
+        """Imports the ``name`` module and runs its ``setup(bot)``, once"""
+        with self._extension_lock:
+            if name in self._extensions:
+                return
+            importlib.import_module(name).setup(self)
+            self._extensions.add(name)
+
+    def defer_extensions(self, manifest: Manifest) -> None:
+        """Registers where everything in the ``manifest`` comes from instead of
+        loading it, each extension is loaded the first time it's needed"""
+        for name, extension in manifest.extensions.items():
+            for kind in self._deferred:
+                for key in extension[kind]:
+                    self._deferred[kind][key] = name
+            if extension["router"]:
+                self._routers.append(name)
+
+    def _load_deferred(self, kind: str, key: Optional[str] = None) -> bool:
+        """Loads the extension for ``key`` (or all of ``kind``), True if any was
+        loaded"""
+        deferred = self._deferred[kind]
+        names = set(deferred.values()) if key is None else {deferred.get(key)}
+        names -= self._extensions | {None}
+        for name in names:
+            self.load_extension(name)
+        return bool(names)
+
+    def _load_routers(self) -> bool:
+        routers = [name for name in self._routers if name not in self._extensions]
+        for name in routers:
+            self.load_extension(name)
+        return bool(routers)
+
     @property
     def plugins(self):
+        self._load_deferred("plugins")
         return self.__plugins.values()
 
     def add_plugin(self, plugin: SquidPlugin) -> SquidPlugin:
@@ -87,6 +174,8 @@ class SquidBot(object):
         return plugin
 
     def get_plugin(self, plugin_name: str) -> Optional[SquidPlugin]:
+        if plugin_name not in self.__plugins:
+            self._load_deferred("plugins", plugin_name)
         return self.__plugins.get(plugin_name, None)
 
     def remove_plugin(self, plugin_name: str) -> Optional[SquidPlugin]:
@@ -97,18 +186,36 @@ class SquidBot(object):
         return plugin
 
     def get_command(self, command_name: str) -> Optional[SquidCommand]:
+        if command_name not in self._commands:
+            self._load_deferred("commands", command_name)
         return self._commands.get(command_name, None)
 
     def add_command(self, command: SquidCommand) -> SquidCommand:
         if not isinstance(command, SquidCommand):
             raise ValueError("command must be of type SquidCommand")
         self._commands[command.qualified_name] = command
+        self._routes.add(command)
         return command
 
     def remove_command(self, command_name: str) -> Optional[SquidCommand]:
+        self._routes.remove(command_name)
         return self._commands.pop(command_name, None)
 
+    def match_command(self, tokens: List[str]) -> Tuple[Optional[SquidCommand], int]:
+        """The longest command ``tokens`` starts with, ``giveaway start`` for
+        ``giveaway start 1h prize``, and how many tokens its name took"""
+        if tokens and tokens[0] not in self._routes:
+            self._load_deferred("commands", tokens[0].lower())
+        return self._routes.longest_prefix(tokens)
+
+    def find_command(self, tokens: List[str]) -> Optional[SquidCommand]:
+        """The command named exactly ``tokens``"""
+        command, depth = self.match_command(tokens)
+        return command if depth == len(tokens) else None
+
     def get_handler(self, handler_name: str) -> Optional[Callable]:
+        if handler_name not in self._handlers:
+            self._load_deferred("handlers", handler_name)
         return self._handlers.get(handler_name, None)
 
     def add_handler(self, handler: View) -> None:
@@ -117,6 +224,19 @@ class SquidBot(object):
     def remove_handler(self, handler_name: str) -> Optional[Callable]:
         return self._handlers.pop(handler_name, None)
 
+    @property
+    def tasks(self) -> Dict[str, Callable[[str], None]]:
+        self._load_deferred("tasks")
+        return self._tasks
+
+    def add_task(self, queue: str, task: Callable[[str], None]) -> None:
+        """Runs ``task`` with each item of the ``queue`` sorted set once it's
+        due, see :class:`squid.bot.scheduler.Scheduler`"""
+        self._tasks[queue] = task
+
+    def remove_task(self, queue: str) -> Optional[Callable]:
+        return self._tasks.pop(queue, None)
+
     def unknown_command(self, ctx: CommandContext) -> InteractionResponse:
         return InteractionResponse.channel_message(
             embed=Embed(
@@ -128,23 +248,16 @@ class SquidBot(object):
         )
 
     def unknown_component(self, interaction: Interaction) -> InteractionResponse:
-        return InteractionResponse.channel_message(
-            embed=Embed(
-                title="Unknown Component",
-                description="This issue will be fixed soon ;(",
-                color=Color.red(),
-            ),
-            ephemeral=True,
-        )
+        return UNKNOWN_COMPONENT
 
     def on_error(self, ctx: CommandContext, error: Exception) -> InteractionResponse:
-        if isinstance(error, NumberOverflow):
+        if isinstance(error, expr_errors.NumberOverflow):
             embed = Embed(
                 title="Number Overflow",
                 description="The number you entered is too large.",
                 color=ctx.bot.colors["error"],
             )
-        elif isinstance(error, (UnknownPointer, Gibberish)):
+        elif isinstance(error, (expr_errors.UnknownPointer, expr_errors.Gibberish)):
             embed = Embed(
                 title="Gibberish",
                 description=f"```cs\n{error.friendly}\n```",
@@ -180,37 +293,32 @@ class SquidBot(object):
         return InteractionResponse.channel_message(embed=embed, ephemeral=True)
 
     def _get_command(
-        self, _interaction: "Interaction", cmd: "ApplicationCommand", names: list = None
-    ):
-        """Get the actual name of the command including subcommands
+        self, _interaction: "Interaction", cmd: "ApplicationCommand"
+    ) -> Optional[SquidCommand]:
+        """Get the actual command including subcommands
 
         Args:
             interaction (Interaction): The interaction for the command name
         """
-
-        if names is None:
-            names = [cmd.name]
-            s = cmd.options
-            for option in s:
-                if option.type == ApplicationCommandOptionType.sub_command:
-                    names.append(option.name)
-                    s.extend(option.options)
-
-        parent = self
-        name = ""
-        for i in range(len(names)):
-            name = " ".join(names[: i + 1]).lower()
-            parent = parent.get_command(name)
-            if not parent:
-                return None
-        return parent
+        name = cmd.name.lower()
+        if name not in self._routes:
+            self._load_deferred("commands", name)
+            if name not in self._routes and self._load_routers():
+                # a router (tags) may know it, it replaced this lookup on load
+                return self._get_command(_interaction, cmd)
+
+        command, options = self._routes.resolve(cmd)
+        if options is not cmd.options:
+            # the arguments are read from the top level options
+            cmd.options.extend(options)
+        return command
 
     def invoke(self, ctx: SquidContext) -> Optional[InteractionResponse]:
         if ctx.interaction.type == InteractionType.component:
             try:
                 if ctx.handler is not None:
                     if self.can_run(ctx):
-                        sentry_sdk.set_context(
+                        set_sentry_context(
                             "message-component", {"name": ctx.data.typ, "ctx": ctx}
                         )
                         return ctx.invoke(ctx.handler)
@@ -241,22 +349,138 @@ class SquidBot(object):
         except ValueError:
             pass
 
+    def redis_scope(self):
+        """Pins a single redis connection for the lifetime of one interaction"""
+        if isinstance(self.redis, ManagedRedis):
+            return self.redis.scope()
+        return nullcontext(self.redis)
+
     @flask_compat
     def process(self, interaction: Interaction):
-        return self.state.execute(interaction)
+        with self.redis_scope():
+            return self.state.execute(interaction)
 
     def handle_ping(self):
         """You can override in case discord changes stuff in the future"""
-        return InteractionResponse.pong()
+        return PONG
+
+    def warm_up(self, guild_ids: Iterable[int] = ()) -> Dict[str, Dict[str, Any]]:
+        """Builds and connects everything the first requests would otherwise
+        wait on, returns how long each step took
+
+        ``guild_ids`` are the guilds to prime the settings cache for. A step
+        that fails is reported with its error and the rest still run.
+        """
+        guild_ids = [int(g) for g in guild_ids]
+        steps = {}
+
+        def step(name: str, fn: Callable[[], Any]):
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                log.warning("Warm up step %s failed", name, exc_info=True)
+                steps[name] = {"error": repr(e)}
+            else:
+                steps[name] = {"result": result}
+            steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        def resources():
+            names = []
+            for name, value in vars(self).items():
+                if isinstance(value, Lazy):
+                    value.get()
+                    names.append(name)
+            return names
+
+        def ping_redis():
+            with self.redis_scope() as redis:
+                return redis.ping()
+
+        def ping_db():
+            with self.db as db:
+                return db.command("ping").get("ok")
+
+        def ping_discord():
+            # opens the session's connection pool to discord
+            return bool(self.http.request(Route("GET", "/gateway")))
+
+        def extensions():
+            for kind in self._deferred:
+                self._load_deferred(kind)
+            self._load_routers()
+            return sorted(self._extensions)
+
+        def prime_settings():
+            with self.settings as settings:
+                return settings.prime(self, guild_ids)
+
+        def compile_templates():
+            with self.settings as settings, self.engine as engine:
+                templates = settings.templates(guild_ids)
+                for source in templates:
+                    engine.compile(source)
+            return len(templates)
+
+        step("resources", resources)
+        step("redis", ping_redis)
+        step("db", ping_db)
+        step("discord", ping_discord)
+        step("extensions", extensions)
+        step("settings", prime_settings)
+        step("templates", compile_templates)
+        return steps
+
+    def remaining_time(self, ctx: SquidContext) -> Optional[float]:
+        """Seconds left before the response deadline, if there is one"""
+        if not self.response_deadline:
+            return None
+        elapsed = time.monotonic() - ctx.interaction.received_at
+        return self.response_deadline - elapsed
+
+    def respond_in_time(
+        self,
+        ctx: SquidContext,
+        invoke: Callable[[SquidContext], InteractionResponse],
+        *,
+        defer: bool = False,
+        budget: Optional[float] = None,
+        ephemeral: bool = False,
+        inline: bool = False,
+    ) -> InteractionResponse:
+        """Invokes the handler, deferring its response if it's marked slow or
+        runs past its budget or the response deadline. ``inline`` handlers
+        aren't held to the deadline"""
+        if (
+            not defer
+            and not inline
+            and (remaining := self.remaining_time(ctx)) is not None
+        ):
+            budget = remaining if budget is None else min(budget, remaining)
+
+        if defer or budget is not None:
+            return self.deferral.run(ctx, invoke, budget=budget, ephemeral=ephemeral)
+        return invoke(ctx)
 
     def handle_application_command(
         self, command: ApplicationCommand, interaction: Interaction
     ):
         ctx = CommandContext(self, command, interaction)
+        if ctx.command is None:
+            return self.unknown_command(ctx)
+        return self.respond_in_time(
+            ctx,
+            self._run_command,
+            defer=ctx.command.defer,
+            budget=ctx.command.budget,
+            ephemeral=ctx.command.ephemeral,
+        )
+
+    def _run_command(self, ctx: CommandContext) -> InteractionResponse:
         try:
             if ctx.command is not None:
                 if self.can_run(ctx):
-                    sentry_sdk.set_context(
+                    set_sentry_context(
                         "command", {"name": ctx.command.qualified_name, "ctx": ctx}
                     )
                     return ctx.command.invoke(ctx)
@@ -268,10 +492,21 @@ class SquidBot(object):
 
     def handle_component(self, component: Component, interaction: Interaction):
         ctx = ComponentContext(self, component, interaction)
+        if ctx.handler is None:
+            return self.unknown_component(ctx.interaction)
+        return self.respond_in_time(
+            ctx,
+            self._run_component,
+            defer=ctx.handler.DEFER,
+            budget=ctx.handler.BUDGET,
+            inline=ctx.handler.INLINE,
+        )
+
+    def _run_component(self, ctx: ComponentContext) -> InteractionResponse:
         try:
             if ctx.handler is not None:
                 if self.can_run(ctx):
-                    sentry_sdk.set_context(
+                    set_sentry_context(
                         "message-component", {"name": ctx.data.typ, "ctx": ctx}
                     )
                     return ctx.invoke(ctx.handler)
@@ -6,6 +6,7 @@ from squid.utils import evaluate_annotation
 from .context import CommandContext
 from squid.errors import ArgumentParsingError
 from .converter import get_converter
+from .binding import ArgumentBinder
 import functools
 
 CommandT = TypeVar("CommandT", bound="SquidCommand")
@@ -98,6 +99,12 @@ class SquidCommand(_BaseCommand):
         self.callback = func
         self.enabled: bool = kwargs.get("enabled", True)
 
+        # slow commands answer with a deferred response and finish in the
+        # background, see :class:`squid.bot.deferral.Deferral`
+        self.defer: bool = kwargs.get("defer", False)
+        self.budget: Optional[float] = kwargs.get("budget")
+        self.ephemeral: bool = kwargs.get("ephemeral", False)
+
         help_doc = kwargs.get("help")
         if help_doc is not None:
             help_doc = inspect.cleandoc(help_doc)
@@ -159,6 +166,7 @@ class SquidCommand(_BaseCommand):
             globalns = {}
 
         self.params = get_signature_parameters(value, globalns)
+        self.binder = ArgumentBinder(self.params)
 
     def add_check(self, func: Callable, /) -> None:
         """Adds a check to the command.
@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from redis import BlockingConnectionPool, Redis
+
+__all__ = ("PoolStats", "CountingConnectionPool", "ManagedRedis")
+
+
+class PoolStats(object):
+    """
+    Thread-safe counters describing how the shared redis pool is being used
+    """
+
+    __slots__ = ("_lock", "connects", "reuses", "waits", "wait_time")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.reuses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def incr(self, name: str, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {k: getattr(self, k) for k in self.__slots__ if k != "_lock"}
+
+    def __repr__(self):
+        return "<PoolStats {}>".format(
+            " ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        )
+
+
+class CountingConnectionPool(BlockingConnectionPool):
+    """
+    A blocking pool that records socket connects, connection reuses and the
+    time callers spent waiting for a free connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._local = threading.local()
+
+        pool = self
+        base = self.connection_class
+
+        # subclassing whatever connection class was configured (tcp, ssl, unix)
+        # so every real socket connect is counted no matter who triggers it
+        def _connect(conn):
+            pool.stats.incr("connects")
+            pool._local.connected = True
+            return base._connect(conn)
+
+        self.connection_class = type(base)(
+            base.__name__, (base,), {"_connect": _connect}
+        )
+
+    def get_connection(self, *args, **kwargs):
+        waited = self.pool.empty()
+        self._local.connected = False
+        start = time.perf_counter()
+
+        connection = super().get_connection(*args, **kwargs)
+
+        if waited:
+            self.stats.incr("waits")
+            self.stats.incr("wait_time", time.perf_counter() - start)
+        if not self._local.connected:
+            self.stats.incr("reuses")
+        return connection
+
+
+class ManagedRedis(object):
+    """
+    Long lived redis client shared across requests on a warm instance.
+
+    ``with bot.redis as redis:`` hands out a client without closing the pool
+    afterwards, and inside :meth:`scope` every block on the same thread shares
+    a single pinned connection.
+    """
+
+    def __init__(self, pool: CountingConnectionPool):
+        self.pool = pool
+        self._client = Redis(connection_pool=pool)
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(
+        cls,
+        url: Optional[str] = None,
+        *,
+        max_connections: int = 20,
+        timeout: int = 5,
+        health_check_interval: int = 30,
+        **kwargs,
+    ):
+        kwargs.update(
+            max_connections=max_connections,
+            timeout=timeout,
+            health_check_interval=health_check_interval,
+        )
+        if url:
+            pool = CountingConnectionPool.from_url(url, **kwargs)
+        else:
+            pool = CountingConnectionPool(**kwargs)
+        return cls(pool)
+
+    @property
+    def stats(self) -> PoolStats:
+        return self.pool.stats
+
+    @property
+    def client(self) -> Redis:
+        """The pinned client for the current scope or the shared client"""
+        if not getattr(self._local, "scoped", False):
+            return self._client
+
+        if self._local.client is None:
+            self._local.client = Redis(
+                connection_pool=self.pool, single_connection_client=True
+            )
+        return self._local.client
+
+    @contextmanager
+    def scope(self):
+        """Pin one pooled connection to the current thread until the scope exits
+
+        The connection is only checked out the first time redis is touched so
+        interactions that never use redis (pings) don't pay for it.
+        """
+        if getattr(self._local, "scoped", False):
+            yield self
+            return
+
+        self._local.scoped = True
+        self._local.client = None
+        try:
+            yield self
+        finally:
+            client, self._local.client = self._local.client, None
+            self._local.scoped = False
+            if client is not None:
+                # returns the connection to the pool, the pool itself stays open
+                client.close()
+
+    def __enter__(self) -> Redis:
+        return self.client
+
+    def __exit__(self, *_):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __repr__(self):
+        return f"<ManagedRedis pool={self.pool!r} stats={self.stats!r}>"
@@ -1,14 +1,10 @@
 from typing import TYPE_CHECKING, Callable, Optional, Type
 from discord import Message, Role, User, utils
-from sentry_sdk.api import capture_exception, push_scope
 from squid.bot.errors import SquidError
 from squid.models.abc import Messageable
-from squid.models.enums import ApplicationCommandOptionType
-from squid.models.interaction import (
-    ApplicationCommand,
-    ApplicationCommandOption,
-    InteractionResponse,
-)
+from squid.models.interaction import ApplicationCommand, InteractionResponse
+from squid.bot.binding import ArgumentBinder
+from squid.models.functions import Lazy, lazy_import
 from squid.models.member import Member
 from squid.models.views import ButtonData
 from ..models import Interaction
@@ -19,6 +15,11 @@ if TYPE_CHECKING:
     from squid.bot.command import SquidCommand
     from squid.bot.plugin import PluginMeta
 
+sentry_sdk = lazy_import("sentry_sdk")
+
+# binds every option as is, for contexts without a command
+EMPTY_BINDER = ArgumentBinder({})
+
 
 class SquidContext(Messageable, object):
     def __init__(self, bot, interaction: Interaction):
@@ -69,6 +70,13 @@ class SquidContext(Messageable, object):
     def channel(self):
         return self.bot.state._get_guild_channel(self.channel_id)
 
+    def deferred(self, name: str) -> Lazy:
+        """Defers loading an attribute (author, channel, guild) until it's used
+
+        Useful for tagscript seed variables which are skipped when unreferenced
+        """
+        return Lazy(getattr, self, name)
+
     # @property
     # def author(self) -> Member:
     #     """Discord will either pass in a user or member object this will return a mix"""
@@ -200,47 +208,17 @@ class CommandContext(SquidContext):
 
         return resolver
 
-    def _resolve(self, i: ApplicationCommandOption):
-
-        """
-        STRING	= 3
-        INTEGER	= 4	#       Any integer between -2^53 and 2^53
-        BOOLEAN	= 5
-        USER	= 6
-        CHANNEL	= 7	#       Includes all channel types + categories
-        ROLE	= 8
-        MENTIONABLE	= 9 #   Includes users and roles
-        NUMBER	= 10 #      Any double between -2^53 and 2^53
-        """
-        cast = {
-            ApplicationCommandOptionType.string: str,
-            ApplicationCommandOptionType.integer: int,
-            ApplicationCommandOptionType.boolean: bool,
-            ApplicationCommandOptionType.user: self._resolve_id("user"),
-            ApplicationCommandOptionType.channel: self._resolve_id("channel"),
-            ApplicationCommandOptionType.role: self._resolve_id("role"),
-            ApplicationCommandOptionType.mentionable: self._resolve_id(
-                "user"
-            ),  # TODO: resolve to proper types
-            ApplicationCommandOptionType.number: int,
-        }
-
-        if i.type in cast and i.value:
-            return cast[i.type](i.value)
-        return i.value
-
     @property
     def kwargs(self) -> dict:
-
-        return {
-            i.name: self._resolve(i)
-            for i in [
-                x
-                for x in self.command_data.options
-                if x.type != ApplicationCommandOptionType.sub_command
-                and x.value is not None
-            ]
-        }
+        """The command's arguments, bound once for the command data"""
+        bound = self.__dict__.get("_bound")
+        if bound is None or bound[0] is not self.command_data:
+            binder = self.command.binder if self.command else EMPTY_BINDER
+            bound = self._bound = (
+                self.command_data,
+                binder.bind(self, self.command_data.options),
+            )
+        return bound[1]
 
     def __repr__(self):
         return f"<CommandContext: {self.interaction!r}>"
@@ -255,14 +233,14 @@ class CommandContext(SquidContext):
                 command.command_check(self, command)
             return command(self, *args, **{**self.kwargs, **kwargs})
         except Exception as e:
-            with push_scope() as scope:
+            with sentry_sdk.push_scope() as scope:
                 scope.set_extra("interaction", self.interaction)
                 scope.set_extra("command", command)
                 scope.set_extra("args", args)
                 scope.set_extra("kwargs", kwargs)
 
                 if self.bot.sentry:
-                    capture_exception(e)
+                    sentry_sdk.capture_exception(e)
                 # handling errors
                 if hasattr(command, "on_error"):
                     return command.on_error(self, e)
@@ -302,3 +280,28 @@ class ComponentContext(SquidContext):
 
     def __repr__(self):
         return f"<ComponentContext: data={self.data} interaction={self.interaction}>"
+
+
+class TaskContext(SquidContext):
+    """Context for scheduled tasks, which run outside of any interaction"""
+
+    def __init__(self, bot, plugin, *, guild_id, channel_id=None):
+        self.interaction = None
+        self.bot: "SquidBot" = bot
+        self._state = bot.state
+        self.http: "HttpClient" = bot.http
+
+        self.guild_id: int = int(guild_id)
+        self.channel_id = channel_id
+        self._plugin = plugin
+
+    @property
+    def plugin(self):
+        return self._plugin
+
+    @plugin.setter
+    def plugin(self, cog):
+        self._plugin = cog
+
+    def __repr__(self):
+        return f"<TaskContext: plugin={self._plugin.qualified_name} guild_id={self.guild_id}>"
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from discord import InteractionResponseType, InteractionType
+from discord.errors import NotFound
+
+from squid.models.interaction import InteractionResponse
+
+if TYPE_CHECKING:
+    from squid.bot import SquidBot
+    from squid.bot.context import SquidContext
+
+__all__ = ("Deferral",)
+
+log = logging.getLogger(__name__)
+
+DEFERRED = (
+    InteractionResponseType.deferred_channel_message,
+    InteractionResponseType.deferred_message_update,
+)
+
+
+class _Pending(object):
+    __slots__ = ("lock", "done", "deferred", "response", "error")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.deferred = None
+        self.response = None
+        self.error = None
+
+
+class Deferral(object):
+    """
+    Finishes slow handlers after discord has been answered.
+
+    The handler runs on a background executor. If it returns within
+    ``budget`` seconds its response is used as is, otherwise discord is sent a
+    deferred response straight away and the handler's eventual response edits
+    it through the interaction's webhook (or is sent as a follow-up when it's
+    a new message for a component). Interaction tokens stay valid for 15
+    minutes. On Cloud Functions the instance needs CPU allocated outside of
+    requests for deferred handlers to finish promptly.
+    """
+
+    def __init__(self, bot: "SquidBot", *, max_workers: int = 8, retries: int = 3):
+        self.bot = bot
+        self.retries = retries
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="deferral"
+        )
+        self._lock = threading.Lock()
+
+        self.answered = 0
+        self.deferred = 0
+        self.delivered = 0
+        self.failed = 0
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    @staticmethod
+    def acknowledgement(
+        ctx: "SquidContext", *, ephemeral: bool = False
+    ) -> InteractionResponse:
+        if ctx.interaction.type == InteractionType.component:
+            # acks the click, the message is edited once the handler finishes
+            return InteractionResponse.defferred_message_update()
+        return InteractionResponse.deferred_channel_message(ephemeral=ephemeral)
+
+    def run(
+        self,
+        ctx: "SquidContext",
+        invoke: Callable[["SquidContext"], InteractionResponse],
+        *,
+        budget: Optional[float] = None,
+        ephemeral: bool = False,
+    ) -> InteractionResponse:
+        """Runs ``invoke(ctx)`` in the background, returning its response if
+        it finishes within ``budget`` seconds or a deferred one if it doesn't"""
+        pending = _Pending()
+        self._executor.submit(self._complete, ctx, invoke, pending)
+
+        if budget is not None:
+            pending.done.wait(max(budget, 0))
+
+        with pending.lock:
+            if pending.done.is_set():
+                self._count("answered")
+                if pending.error is not None:
+                    raise pending.error
+                return pending.response
+
+            pending.deferred = self.acknowledgement(ctx, ephemeral=ephemeral)
+            self._count("deferred")
+            return pending.deferred
+
+    def _complete(self, ctx: "SquidContext", invoke: Callable, pending: _Pending):
+        response = error = None
+        try:
+            with self.bot.redis_scope(), self.bot.state.loader.scope():
+                # the request thread's batch doesn't carry over to this one
+                self.bot.state._defer_interaction(ctx.interaction)
+                response = invoke(ctx)
+        except Exception as e:
+            error = e
+
+        with pending.lock:
+            if pending.deferred is None:
+                pending.response, pending.error = response, error
+                pending.done.set()
+                return
+
+        if error is not None:
+            log.error("Deferred handler for %r failed", ctx, exc_info=error)
+            self._count("failed")
+            return
+
+        try:
+            self.deliver(ctx, response, pending.deferred)
+        except Exception:
+            log.exception("Unable to deliver the deferred response for %r", ctx)
+            self._count("failed")
+        else:
+            self._count("delivered")
+
+    @staticmethod
+    def payload(response: InteractionResponse, *, edit: bool = False) -> dict:
+        data = response.to_dict()["data"]
+        data.pop("type", None)
+        data.pop("choices", None)
+        if edit:
+            # not editable, ephemerality was decided by the acknowledgement
+            data.pop("tts", None)
+            data.pop("flags", None)
+        return data
+
+    def deliver(
+        self,
+        ctx: "SquidContext",
+        response: Optional[InteractionResponse],
+        ack: InteractionResponse,
+    ):
+        """Sends the handler's ``response`` to an interaction answered with
+        ``ack``"""
+        if response is None or response.type in DEFERRED:
+            return  # the handler took care of it
+
+        http, app_id, token = self.bot.http, ctx.application_id, ctx.token
+        new_message = response.type == InteractionResponseType.channel_message
+
+        if ack.type == InteractionResponseType.deferred_message_update:
+            if new_message:
+                return self._retry(
+                    http.create_followup_message, app_id, token, self.payload(response)
+                )
+        elif response.flags and not ack.flags:
+            # an ephemeral answer (usually an error) to a public deferral
+            self._retry(http.delete_original_response, app_id, token)
+            return http.create_followup_message(app_id, token, self.payload(response))
+
+        return self._retry(
+            http.edit_original_response,
+            app_id,
+            token,
+            self.payload(response, edit=True),
+        )
+
+    def _retry(self, fn: Callable, *args):
+        # the original response 404s until discord has processed the ack
+        for attempt in range(self.retries):
+            try:
+                return fn(*args)
+            except NotFound:
+                if attempt == self.retries - 1:
+                    raise
+                time.sleep(0.5 * (attempt + 1))
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "answered": self.answered,
+            "deferred": self.deferred,
+            "delivered": self.delivered,
+            "failed": self.failed,
+        }
@@ -0,0 +1,167 @@
+"""
+A snapshot of what each extension registers, so a cold start can route
+interactions without importing every plugin.
+
+Rebuild it whenever a command, view or task changes:
+    python -m squid.bot.manifest plugins manifest.json
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import logging
+import os
+import sys
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    from squid.bot import SquidBot, SquidCommand
+
+__all__ = ("Manifest",)
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def fingerprint(package: str) -> str:
+    """Hashes the sources of ``package`` so a stale manifest is never used"""
+    root = os.path.dirname(importlib.util.find_spec(package).origin)
+    digest = hashlib.blake2b(digest_size=16)
+    for path, dirs, files in sorted(os.walk(root)):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".py"):
+                digest.update(os.path.relpath(os.path.join(path, name), root).encode())
+                with open(os.path.join(path, name), "rb") as fp:
+                    digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def _path(obj) -> str:
+    return f"{obj.__module__}:{obj.__qualname__}"
+
+
+def _describe(command: "SquidCommand") -> Dict[str, Any]:
+    from squid.models.commands import CreateApplicationCommand
+
+    params = []
+    for name, param in command.params.items():
+        if name in ("self", "ctx"):
+            continue
+        params.append(
+            {
+                "name": name,
+                "kind": param.kind.name,
+                "annotation": (
+                    None
+                    if param.annotation is param.empty
+                    else inspect.formatannotation(param.annotation)
+                ),
+                "required": param.default is param.empty,
+            }
+        )
+
+    data = {
+        "callback": _path(command.callback),
+        "params": params,
+        "commands": {c.name: _describe(c) for c in command.commands},
+    }
+    if command.parent is None and not command.ignore_register:
+        try:
+            data["schema"] = CreateApplicationCommand.from_command(command).serialize()
+        except ValueError:
+            data["schema"] = None
+    return data
+
+
+class Manifest(object):
+    """
+    The commands, views, tasks and plugins each extension (a module with a
+    ``setup(bot)``) registers, see :meth:`SquidBot.defer_extensions`.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    @property
+    def extensions(self) -> Dict[str, dict]:
+        return self.data["extensions"]
+
+    @classmethod
+    def build(cls, bot: "SquidBot", package: str) -> "Manifest":
+        """Loads every extension listed in ``package.EXTENSIONS`` into ``bot``
+        and records what each of them added"""
+        extensions = {}
+        for name in importlib.import_module(package).EXTENSIONS:
+            commands, handlers = set(bot._commands), set(bot._handlers)
+            tasks, plugins = set(bot._tasks), {p.qualified_name for p in bot.plugins}
+            router = bot.__dict__.get("_get_command")
+
+            bot.load_extension(name)
+
+            extensions[name] = {
+                "commands": {
+                    k: _describe(v)
+                    for k, v in bot._commands.items()
+                    if k not in commands
+                },
+                "handlers": {
+                    k: _path(v) for k, v in bot._handlers.items() if k not in handlers
+                },
+                "tasks": [k for k in bot._tasks if k not in tasks],
+                "plugins": [
+                    p.qualified_name
+                    for p in bot.plugins
+                    if p.qualified_name not in plugins
+                ],
+                # takes over command lookup (tags), loaded for unknown commands
+                "router": bot.__dict__.get("_get_command") is not router,
+            }
+
+        return cls(
+            {
+                "version": VERSION,
+                "package": package,
+                "fingerprint": fingerprint(package),
+                "extensions": extensions,
+            }
+        )
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Manifest"]:
+        """The manifest at ``path`` or None if it's missing or out of date"""
+        try:
+            with open(path, "rb") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return None
+
+        if data.get("version") != VERSION:
+            log.warning("Ignoring %s, it was built by another version", path)
+            return None
+        if data["fingerprint"] != fingerprint(data["package"]):
+            log.warning(
+                "Ignoring %s, %s changed since it was built", path, data["package"]
+            )
+            return None
+        return cls(data)
+
+    def dump(self, path: str):
+        with open(path, "w") as fp:
+            json.dump(self.data, fp, indent=2)
+            fp.write("\n")
+
+
+def main(package: str = "plugins", path: str = "manifest.json", *_: Iterable[str]):
+    from squid.bot import SquidBot
+
+    bot = SquidBot(public_key="", token="", squid_requirements={})
+    Manifest.build(bot, package).dump(path)
+    print(f"Wrote {path} for {package}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,93 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from squid.models.enums import ApplicationCommandOptionType
+
+if TYPE_CHECKING:
+    from squid.bot.command import SquidCommand
+    from squid.models.interaction import ApplicationCommand, ApplicationCommandOption
+
+__all__ = ("CommandTrie",)
+
+SUBCOMMANDS = (
+    ApplicationCommandOptionType.sub_command,
+    ApplicationCommandOptionType.sub_command_group,
+)
+
+
+class _Node(object):
+    __slots__ = ("command", "children")
+
+    def __init__(self):
+        self.command: Optional["SquidCommand"] = None
+        self.children: Dict[str, "_Node"] = {}
+
+
+class CommandTrie(object):
+    """
+    Commands keyed by the tokens of their qualified name, ``giveaway start``
+    lives under ``giveaway`` then ``start``.
+
+    A command and all of its subcommands are added when it's registered, so a
+    lookup is one dict access per token. Tokens are lowercased on the way in.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def _node(self, tokens: Iterable[str]) -> Optional[_Node]:
+        node = self._root
+        for token in tokens:
+            if (node := node.children.get(token.lower())) is None:
+                return None
+        return node
+
+    def add(self, command: "SquidCommand"):
+        node = self._root
+        for token in command.qualified_name.lower().split():
+            node = node.children.setdefault(token, _Node())
+        node.command = command
+        for subcommand in command.commands:
+            self.add(subcommand)
+
+    def remove(self, name: str) -> Optional["SquidCommand"]:
+        """Removes the top level command ``name`` and its subcommands"""
+        if (node := self._root.children.pop(name.lower(), None)) is not None:
+            return node.command
+        return None
+
+    def get(self, tokens: Iterable[str]) -> Optional["SquidCommand"]:
+        """The command at exactly ``tokens``"""
+        if (node := self._node(tokens)) is not None:
+            return node.command
+        return None
+
+    def longest_prefix(self, tokens: List[str]) -> Tuple[Optional["SquidCommand"], int]:
+        """The deepest command ``tokens`` starts with and how many tokens its
+        name took, ``(None, 0)`` if it doesn't start with one"""
+        node, match, depth = self._root, None, 0
+        for i, token in enumerate(tokens):
+            if (node := node.children.get(token.lower())) is None:
+                break
+            if node.command is not None:
+                match, depth = node.command, i + 1
+        return match, depth
+
+    def resolve(
+        self, cmd: "ApplicationCommand"
+    ) -> Tuple[Optional["SquidCommand"], List["ApplicationCommandOption"]]:
+        """The command an interaction invokes, following its subcommand options
+        down, and the options given to it"""
+        node = self._root.children.get(cmd.name.lower())
+        options = cmd.options
+        while node is not None:
+            for option in options:
+                if option.type in SUBCOMMANDS:
+                    node = node.children.get(option.name.lower())
+                    options = option.options
+                    break
+            else:
+                return node.command, options
+        return None, []
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._root.children
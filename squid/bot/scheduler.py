@@ -0,0 +1,282 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from squid.bot import SquidBot
+
+__all__ = ("Scheduler",)
+
+log = logging.getLogger(__name__)
+
+# KEYS: queue, leases, owners
+# ARGV: now, lease expiry, batch size, worker id
+CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, item in ipairs(expired) do
+    redis.call('ZADD', KEYS[1], 'NX', ARGV[1], item)
+    redis.call('ZREM', KEYS[2], item)
+    redis.call('HDEL', KEYS[3], item)
+end
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for _, item in ipairs(due) do
+    redis.call('ZREM', KEYS[1], item)
+    redis.call('ZADD', KEYS[2], ARGV[2], item)
+    redis.call('HSET', KEYS[3], item, ARGV[4])
+end
+return due
+"""
+
+# KEYS: leases, owners, attempts
+# ARGV: item, worker id
+ACK_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: leases, owners
+# ARGV: lease expiry, worker id, items...
+EXTEND_SCRIPT = """
+local lost = {}
+for i = 3, #ARGV do
+    if redis.call('HGET', KEYS[2], ARGV[i]) == ARGV[2] then
+        redis.call('ZADD', KEYS[1], 'XX', ARGV[1], ARGV[i])
+    else
+        table.insert(lost, ARGV[i])
+    end
+end
+return lost
+"""
+
+# KEYS: queue, leases, owners, attempts, dead
+# ARGV: item, worker id, retry at, max attempts, now
+RETRY_SCRIPT = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then
+    return 'lost'
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if redis.call('HINCRBY', KEYS[4], ARGV[1], 1) >= tonumber(ARGV[4]) then
+    redis.call('HDEL', KEYS[4], ARGV[1])
+    redis.call('ZADD', KEYS[5], ARGV[5], ARGV[1])
+    return 'dead'
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 'retry'
+"""
+
+
+class Scheduler(object):
+    """
+    Runs the tasks registered with :meth:`SquidBot.add_task` when the items in
+    their sorted set (scored by unix timestamp) come due.
+
+    Due items are claimed in batches by a script that moves them from the
+    queue onto ``{queue}:leases`` scored by the lease expiry, so any number of
+    workers can share a queue without running an item twice. An item is only
+    removed once its task returns. Failed items are retried with a backoff and
+    moved to ``{queue}:dead`` after ``max_attempts``. A heartbeat pushes back
+    the lease of every item the worker holds each ``lease / 3`` seconds, so
+    only items of a worker that died (or lost redis for a whole lease) are put
+    back on the queue. Tasks must still be safe to run more than once.
+    """
+
+    def __init__(
+        self,
+        bot: "SquidBot",
+        *,
+        worker_id: Optional[str] = None,
+        batch_size: int = 25,
+        concurrency: int = 4,
+        lease: float = 60.0,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        retry_delay: float = 10.0,
+    ):
+        self.bot = bot
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._scripts = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._held: Dict[str, set] = {}
+        self._heartbeat: Optional[threading.Thread] = None
+
+        self.claimed = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+
+    def _count(self, name: str, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _keys(self, queue: str) -> Dict[str, str]:
+        return {
+            "queue": queue,
+            "leases": f"{queue}:leases",
+            "owners": f"{queue}:owners",
+            "attempts": f"{queue}:attempts",
+            "dead": f"{queue}:dead",
+        }
+
+    def _script(self, redis, source: str):
+        if (script := self._scripts.get(source)) is None:
+            script = self._scripts[source] = redis.register_script(source)
+        return script
+
+    def claim(self, queue: str) -> List[str]:
+        k = self._keys(queue)
+        now = time.time()
+        with self.bot.redis as redis:
+            items = self._script(redis, CLAIM_SCRIPT)(
+                keys=[k["queue"], k["leases"], k["owners"]],
+                args=[now, now + self.lease, self.batch_size, self.worker_id],
+                client=redis,
+            )
+        self._count("claimed", len(items))
+        if items:
+            with self._lock:
+                self._held.setdefault(queue, set()).update(items)
+            self._start_heartbeat()
+        return items
+
+    def _release(self, queue: str, item: str):
+        with self._lock:
+            self._held.get(queue, set()).discard(item)
+
+    def extend(self) -> int:
+        """Pushes back the lease on every item this worker holds, returns how
+        many are still held"""
+        with self._lock:
+            held = {queue: list(items) for queue, items in self._held.items() if items}
+
+        extended = 0
+        for queue, items in held.items():
+            k = self._keys(queue)
+            with self.bot.redis as redis:
+                lost = self._script(redis, EXTEND_SCRIPT)(
+                    keys=[k["leases"], k["owners"]],
+                    args=[time.time() + self.lease, self.worker_id, *items],
+                    client=redis,
+                )
+            for item in lost:
+                log.warning("Lost the lease on %s:%s", queue, item)
+                self._release(queue, item)
+            extended += len(items) - len(lost)
+        return extended
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None and self._heartbeat.is_alive():
+                return
+            self._heartbeat = threading.Thread(
+                target=self._beat, name="scheduler-heartbeat", daemon=True
+            )
+        self._heartbeat.start()
+
+    def _beat(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                self.extend()
+            except Exception:
+                log.exception("Unable to extend scheduled task leases")
+
+    def ack(self, queue: str, item: str) -> bool:
+        k = self._keys(queue)
+        with self.bot.redis as redis:
+            return bool(
+                self._script(redis, ACK_SCRIPT)(
+                    keys=[k["leases"], k["owners"], k["attempts"]],
+                    args=[item, self.worker_id],
+                    client=redis,
+                )
+            )
+
+    def retry(self, queue: str, item: str) -> str:
+        k = self._keys(queue)
+        now = time.time()
+        with self.bot.redis as redis:
+            return self._script(redis, RETRY_SCRIPT)(
+                keys=[k["queue"], k["leases"], k["owners"], k["attempts"], k["dead"]],
+                args=[
+                    item,
+                    self.worker_id,
+                    now + self.retry_delay,
+                    self.max_attempts,
+                    now,
+                ],
+                client=redis,
+            )
+
+    def _run(self, queue: str, task: Callable[[str], None], item: str):
+        try:
+            task(item)
+        except Exception:
+            log.exception("Task for %s:%s failed", queue, item)
+            if self.retry(queue, item) == "dead":
+                self._count("dead")
+            else:
+                self._count("retried")
+            return
+        finally:
+            self._release(queue, item)
+
+        if self.ack(queue, item):
+            self._count("completed")
+        else:
+            log.warning("Lease on %s:%s expired before it finished", queue, item)
+
+    def run_once(self, executor: Optional[ThreadPoolExecutor] = None) -> int:
+        """Claims and runs one batch from every queue, returns the items ran"""
+        ran = 0
+        for queue, task in list(self.bot.tasks.items()):
+            items = self.claim(queue)
+            if executor is None:
+                for item in items:
+                    self._run(queue, task, item)
+            else:
+                list(executor.map(lambda i: self._run(queue, task, i), items))
+            ran += len(items)
+        return ran
+
+    def run(self):
+        log.info("Scheduler %s watching %s", self.worker_id, ", ".join(self.bot.tasks))
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stop.is_set():
+                try:
+                    ran = self.run_once(executor)
+                except Exception:
+                    log.exception("Unable to claim scheduled tasks")
+                    ran = 0
+                if not ran:
+                    self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "retried": self.retried,
+            "dead": self.dead,
+            "held": sum(len(items) for items in self._held.values()),
+        }
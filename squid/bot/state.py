@@ -1,13 +1,247 @@
 import inspect
-from typing import TYPE_CHECKING, List, Optional
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
 from discord import InteractionType
 import orjson
+from redis.exceptions import RedisError
 from discord.channel import _channel_factory
 from discord.user import BaseUser as User
 from discord import state
 from squid.models.guild import Guild
 from squid.models.interaction import ApplicationCommand, Interaction, MessageComponent
 
+log = logging.getLogger(__name__)
+
+
+class EntityCache(object):
+    """
+    Process wide TTL/LRU cache of decoded redis entities shared by warm requests.
+
+    The gateway writer publishes changed keys on ``channel`` (space separated,
+    ``*`` flushes everything) and a background subscriber evicts them. The
+    subscriber is started once and resubscribes with backoff if redis drops
+    it, the TTL bounds staleness in the meantime. Cached payloads are shared
+    between requests so they must be treated as read-only.
+    """
+
+    def __init__(
+        self, maxsize=4096, ttl=30.0, channel="state:invalidate", max_backoff=60.0
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.channel = channel
+        self.max_backoff = max_backoff
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._subscribed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.misses += 1
+                elif entry[0] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    found[key] = entry[1]
+        return found
+
+    def set_many(self, items: Dict[str, dict]):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            if "*" in keys:
+                self.invalidations += len(self._data)
+                self._data.clear()
+                return
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def _on_message(self, message):
+        data = message.get("data")
+        if isinstance(data, bytes):
+            data = data.decode()
+        if isinstance(data, str):
+            self.invalidate(*data.split())
+
+    def listen(self, redis):
+        """Starts the invalidation subscriber, once"""
+        if redis is None or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(
+                target=self._subscribe,
+                args=(redis,),
+                name="entity-cache-invalidation",
+                daemon=True,
+            )
+        self._listener.start()
+
+    def _subscribe(self, redis):
+        delay = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_message})
+                # anything cached while we weren't listening may be stale
+                self.invalidate("*")
+                self._subscribed, delay = True, 1.0
+                while True:
+                    pubsub.get_message(timeout=1.0)
+            except (RedisError, OSError):
+                # we still have the ttl to fall back on
+                log.warning(
+                    "Lost the subscription to %s, retrying in %.0fs",
+                    self.channel,
+                    delay,
+                    exc_info=True,
+                )
+            finally:
+                self._subscribed = False
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except (RedisError, OSError):
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "listening": self._subscribed,
+        }
+
+
+class EntityLoader(object):
+    """
+    Request scoped batch loader for the json entities the gateway writes to redis.
+
+    Keys are collected with :meth:`defer` and resolved together with a single
+    ``MGET`` the first time anything is loaded, mirroring DataLoader. Decoded
+    values are memoized until the interaction finishes, and found entities are
+    shared with later interactions through the :class:`EntityCache`.
+    """
+
+    def __init__(self, redis, cache: Optional[EntityCache] = None):
+        self.redis = redis
+        self.cache = cache
+        self._local = threading.local()
+
+    @property
+    def scoped(self) -> bool:
+        return getattr(self._local, "cache", None) is not None
+
+    @contextmanager
+    def scope(self):
+        if self.scoped:
+            yield self
+            return
+
+        self._local.cache = {}
+        self._local.pending = []
+        try:
+            yield self
+        finally:
+            self._local.cache = None
+            self._local.pending = None
+
+    def defer(self, *keys):
+        """Queue keys to be fetched alongside the next batch"""
+        if not self.scoped:
+            return
+        cache = self._local.cache
+        self._local.pending.extend(str(k) for k in keys if str(k) not in cache)
+
+    def prime(self, key, value: Optional[dict]):
+        if self.scoped:
+            self._local.cache[str(key)] = value
+
+    def clear(self, key=None):
+        if not self.scoped:
+            return
+        if key is None:
+            self._local.cache.clear()
+        else:
+            self._local.cache.pop(str(key), None)
+
+    def _fetch(self, keys: List[str]) -> List[Optional[dict]]:
+        if not keys:
+            return []
+        if self.cache is None:
+            return [orjson.loads(r) if r else None for r in self.redis.mget(keys)]
+
+        self.cache.listen(self.redis)
+        found = self.cache.get_many(keys)
+        if missing := [k for k in keys if k not in found]:
+            fetched = {
+                k: orjson.loads(r)
+                for k, r in zip(missing, self.redis.mget(missing))
+                if r
+            }
+            self.cache.set_many(fetched)
+            found.update(fetched)
+        return [found.get(k) for k in keys]
+
+    def load(self, key) -> Optional[dict]:
+        return self.load_many([key])[0]
+
+    def load_many(self, keys: Iterable) -> List[Optional[dict]]:
+        keys = [str(k) for k in keys]
+        if not self.scoped:
+            return self._fetch(keys)
+
+        cache = self._local.cache
+        if missing := [k for k in keys if k not in cache]:
+            # folding everything that was deferred into this round trip
+            batch = list(dict.fromkeys(missing + self._local.pending))
+            batch = [k for k in batch if k not in cache]
+            self._local.pending = []
+            cache.update(zip(batch, self._fetch(batch)))
+
+        return [cache[k] for k in keys]
+
 
 class State(state.ConnectionState):
     if TYPE_CHECKING:
@@ -23,6 +257,12 @@ class State(state.ConnectionState):
     def __init__(self, bot, redis, **options):
         self.bot = bot
         self.redis = redis
+        self.cache = EntityCache(
+            maxsize=options.get("cache_size", 4096),
+            ttl=options.get("cache_ttl", 30.0),
+            channel=options.get("invalidation_channel", "state:invalidate"),
+        )
+        self.loader = EntityLoader(redis, self.cache)
         self.shard_count = 1
         self.http = bot.http
         self.allowed_mentions = options.get("allowed_mentions")
@@ -43,11 +283,25 @@ class State(state.ConnectionState):
             interaction (Interaction): The interaction to execute
         """
         if interaction.type in self.parsers:
-            return self.parsers[interaction.type](interaction)
+            with self.loader.scope():
+                self._defer_interaction(interaction)
+                return self.parsers[interaction.type](interaction)
         else:
             print(f"No parser for {interaction.type}")
             return None
 
+    def _defer_interaction(self, interaction: Interaction):
+        """Queue the entities nearly every handler ends up touching so they
+        resolve in the first batch instead of one GET each"""
+        keys = []
+        if interaction.guild_id:
+            keys.append(f"guild.{interaction.guild_id}")
+        if interaction.channel_id:
+            keys.append(f"channel.{interaction.channel_id}")
+        if user := interaction.user or (interaction.member or {}).get("user"):
+            keys.append(f"user.{user['id']}")
+        self.loader.defer(*keys)
+
     def parse_ping(self, _interaction: Interaction):
         return self.bot.handle_ping()
 
@@ -60,11 +314,10 @@ class State(state.ConnectionState):
         return self.bot.handle_component(obj, interaction)
 
     def _get(self, key) -> Optional[dict]:
-        result = self.redis.get(str(key))
-        if result:
-            return orjson.loads(result)
-        else:
-            return None
+        return self.loader.load(key)
+
+    def _get_many(self, keys: Iterable) -> List[Optional[dict]]:
+        return self.loader.load_many(keys)
 
     def _get_all(self, key) -> List[dict]:
         result = self.redis.smembers(str(key)) or []
@@ -87,8 +340,23 @@ class State(state.ConnectionState):
         if not user:
             user = User(state=self, data=data)
             self.redis.set(f"user.{user.id}", orjson.dumps(data))
+            self.loader.prime(f"user.{user.id}", data)
+            self.cache.set_many({f"user.{user.id}": data})
         return user
 
+    def dm_channel_id(self, user_id) -> int:
+        """The id of the DM channel with a user, only opened once since it
+        never changes"""
+        key = f"dm.{user_id}"
+        if channel := self._get(key):
+            return int(channel["id"])
+
+        data = {"id": self.http.start_private_message(int(user_id))["id"]}
+        self.redis.set(key, orjson.dumps(data))
+        self.loader.prime(key, data)
+        self.cache.set_many({key: data})
+        return int(data["id"])
+
     def _get_guild(self, guild_id):
         result = self._get(f"guild.{guild_id}")
         if result:
@@ -1,6 +1,6 @@
 from functools import wraps
 import inspect
-from flask import jsonify
+from flask import Response, jsonify
 from discord import Embed
 
 from squid.models.interaction import InteractionResponse
@@ -20,6 +20,8 @@ def flask_compat(f):
                 )
             )
 
+        if hasattr(response, "to_json"):
+            return Response(response.to_json(), mimetype="application/json")
         return jsonify(response.to_dict())
 
     return wrapper
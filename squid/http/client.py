@@ -3,7 +3,9 @@ from discord.http import Route, json_or_text
 from discord import utils, File
 from discord.errors import Forbidden, NotFound, DiscordServerError
 from .errors import HTTPException
+from .ratelimit import RateLimiter
 from urllib.parse import quote as _uriquote
+import logging
 import sys
 from requests.models import Response
 import requests
@@ -11,6 +13,8 @@ import json
 import time
 from discord.http import HTTPClient as _HTTPClient
 
+log = logging.getLogger(__name__)
+
 
 def json_or_text(response: requests.Response):
     text = response.text
@@ -25,11 +29,17 @@ def json_or_text(response: requests.Response):
 
 
 class HttpClient(_HTTPClient):
-    def __init__(self, token: str, *, session: requests.Session = None):
+    def __init__(
+        self,
+        token: str,
+        *,
+        session: requests.Session = None,
+        ratelimits: RateLimiter = None,
+    ):
         self.token = token
 
         self.__session = session or requests.Session()
-        # implement locks latr  # self._locks = weakref.WeakValueDictionary()
+        self.ratelimits = ratelimits or RateLimiter()
 
         user_agent = "(https://github.com/Squidtoon99/command-handler {0}) Python/{1[0]}.{1[1]} requests/{2}"
         self.user_agent: str = user_agent.format(
@@ -71,18 +81,14 @@ class HttpClient(_HTTPClient):
                 for f in files:
                     f.reset(seek=tries)
 
+            # waiting here instead of finding out from a 429
+            self.ratelimits.acquire(route)
+
             try:
                 response: Response = self.__session.request(method, url, **kwargs)
 
                 data = json_or_text(response)
-                remaining = response.headers.get("X-Ratelimit-Remaining")
-                if remaining == "0" and response.status_code != 429:
-                    pass
-                    # we've depleted our current bucket
-                    # delta = utils._parse_ratelimit_header(response, use_clock=self.use_clock)
-                    # # _log.debug('A rate limit bucket has been exhausted (bucket: %s, retry: %s).', bucket, delta)
-                    # maybe_lock.defer()
-                    # self.loop.call_later(delta, lock.release)
+                self.ratelimits.update(route, response.headers)
 
                 # the request was successful so just return the text/json
                 if 300 > response.status_code >= 200:
@@ -94,31 +100,20 @@ class HttpClient(_HTTPClient):
                         # Banned by Cloudflare more than likely.
                         raise HTTPException(response, data)
 
-                    fmt = 'We are being rate limited. Retrying in %.2f seconds. Handled under the bucket "%s"'
-
-                    # sleep a bit
                     retry_after: float = data["retry_after"]
-                    # _log.warning(fmt, retry_after, bucket)
-
-                    # check if it's a global rate limit
-                    # is_global = data.get("global", False)
-                    # if is_global:
-                    # _log.warning(
-                    #     "Global rate limit has been hit. Retrying in %.2f seconds.",
-                    #     retry_after,
-                    # )
-                    #     self._global_over.clear()
-
-                    time.sleep(retry_after)
-                    # _log.debug("Done sleeping for the rate limit. Retrying...")
-
-                    # release the global lock now that the
-                    # global rate limit has passed
-                    # if is_global:
-                    #     self._global_over.set()
-                    # _log.debug("Global rate limit is now over.")
-
-                    # continue
+                    is_global = data.get("global", False) or bool(
+                        response.headers.get("X-RateLimit-Global")
+                    )
+                    log.warning(
+                        "We are being rate limited on %s %s. Retrying in %.2f seconds.",
+                        method,
+                        route.path,
+                        retry_after,
+                    )
+
+                    # the next acquire sleeps until it's over
+                    self.ratelimits.rate_limited(route, retry_after, is_global)
+                    continue
 
                 # we've received a 500, 502, or 504, unconditional retry
                 if response.status_code in {500, 502, 504}:
@@ -152,6 +147,39 @@ class HttpClient(_HTTPClient):
 
         raise RuntimeError("Unreachable code in HTTP handling")
 
+    # interaction follow-ups, the interaction token authorizes these
+
+    def edit_original_response(
+        self, application_id: int, token: str, payload: Dict[str, Any]
+    ):
+        r = Route(
+            "PATCH",
+            "/webhooks/{webhook_id}/{webhook_token}/messages/@original",
+            webhook_id=application_id,
+            webhook_token=token,
+        )
+        return self.request(r, json=payload)
+
+    def delete_original_response(self, application_id: int, token: str):
+        r = Route(
+            "DELETE",
+            "/webhooks/{webhook_id}/{webhook_token}/messages/@original",
+            webhook_id=application_id,
+            webhook_token=token,
+        )
+        return self.request(r)
+
+    def create_followup_message(
+        self, application_id: int, token: str, payload: Dict[str, Any]
+    ):
+        r = Route(
+            "POST",
+            "/webhooks/{webhook_id}/{webhook_token}",
+            webhook_id=application_id,
+            webhook_token=token,
+        )
+        return self.request(r, json=payload)
+
     def get_from_cdn(self, url: str) -> bytes:
         r = self.__session.get(url)
 
@@ -0,0 +1,353 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Mapping, Optional
+
+from discord.http import Route
+from redis.exceptions import RedisError
+
+__all__ = ("Bucket", "RateLimiter", "RedisRateLimiter")
+
+log = logging.getLogger(__name__)
+
+
+def route_key(route: Route) -> str:
+    """Identifies the route independent of its major parameters"""
+    return f"{route.method} {route.path}"
+
+
+def major_parameters(route: Route) -> str:
+    return "+".join(
+        str(k)
+        for k in (
+            route.channel_id,
+            route.guild_id,
+            getattr(route, "webhook_id", None),
+            getattr(route, "webhook_token", None),
+        )
+        if k is not None
+    )
+
+
+class Bucket(object):
+    __slots__ = ("key", "limit", "remaining", "reset_at")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.limit = 1
+        self.remaining = 1
+        self.reset_at = 0.0
+
+    def __repr__(self):
+        return f"<Bucket key={self.key!r} remaining={self.remaining}/{self.limit}>"
+
+
+class RateLimiter(object):
+    """
+    Tracks discord's rate limit buckets from the response headers and blocks
+    before a request would be rate limited instead of after.
+
+    Routes are mapped to the bucket hash discord reports for them, keyed with
+    the route's major parameters like discord does. Requests reserve a slot in
+    their bucket so concurrent threads don't overdraw it. Global limits close a
+    gate every request waits on, and requests are also kept under
+    ``global_rate`` per second proactively.
+    """
+
+    def __init__(self, *, global_rate: int = 50):
+        self.global_rate = global_rate
+
+        self._lock = threading.Lock()
+        self._routes: Dict[str, str] = {}
+        self._buckets: Dict[str, Bucket] = {}
+        self._global_until = 0.0
+        self._tokens = float(global_rate)
+        self._refilled = time.monotonic()
+
+        self.waits = 0
+        self.wait_time = 0.0
+        self.bucket_waits: Dict[str, List[float]] = {}
+
+    def _bucket_key(self, route: Route) -> Optional[str]:
+        if (bucket_hash := self._routes.get(route_key(route))) is None:
+            return None
+        return f"{bucket_hash}:{major_parameters(route)}"
+
+    def _reserve(self, route: Route) -> float:
+        """Takes a slot for the request or returns how long to wait for one"""
+        now = time.monotonic()
+        if self._global_until > now:
+            return self._global_until - now
+
+        self._tokens = min(
+            self.global_rate,
+            self._tokens + (now - self._refilled) * self.global_rate,
+        )
+        self._refilled = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.global_rate
+
+        bucket = self._buckets.get(self._bucket_key(route))
+        if bucket is not None:
+            if bucket.reset_at <= now:
+                bucket.remaining = bucket.limit
+            if bucket.remaining <= 0:
+                return bucket.reset_at - now
+            bucket.remaining -= 1
+
+        self._tokens -= 1
+        return 0.0
+
+    def _record_wait(self, route: Route, delay: float):
+        name = route_key(route)
+        with self._lock:
+            self.waits += 1
+            self.wait_time += delay
+            waits = self.bucket_waits.setdefault(name, [0, 0.0])
+            waits[0] += 1
+            waits[1] += delay
+        log.debug("Waiting %.2fs for the %s bucket", delay, name)
+
+    def acquire(self, route: Route):
+        while True:
+            with self._lock:
+                delay = self._reserve(route)
+            if delay <= 0:
+                return
+            self._record_wait(route, delay)
+            time.sleep(delay)
+
+    def update(self, route: Route, headers: Mapping[str, str]):
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash is None:
+            return
+
+        with self._lock:
+            self._routes[route_key(route)] = bucket_hash
+            key = self._bucket_key(route)
+            if (bucket := self._buckets.get(key)) is None:
+                bucket = self._buckets[key] = Bucket(key)
+
+            try:
+                bucket.limit = int(headers["X-RateLimit-Limit"])
+                remaining = int(headers["X-RateLimit-Remaining"])
+                reset_at = time.monotonic() + float(headers["X-RateLimit-Reset-After"])
+            except (KeyError, ValueError):
+                return
+
+            if reset_at > bucket.reset_at + 0.5:
+                # a new window, nothing reserved in it yet
+                bucket.remaining = remaining
+            else:
+                # slots reserved by requests still in flight stay taken
+                bucket.remaining = min(bucket.remaining, remaining)
+            bucket.reset_at = reset_at
+
+    def rate_limited(self, route: Route, retry_after: float, is_global: bool):
+        """Called on a 429 so the next attempt waits it out"""
+        until = time.monotonic() + retry_after
+        with self._lock:
+            if is_global:
+                log.warning("Global rate limit hit, retrying in %.2fs", retry_after)
+                self._global_until = max(self._global_until, until)
+                return
+
+            if (key := self._bucket_key(route)) is None:
+                key = route_key(route)
+                self._routes[key] = key
+                key = self._bucket_key(route)
+            bucket = self._buckets.setdefault(key, Bucket(key))
+            bucket.remaining = 0
+            bucket.reset_at = max(bucket.reset_at, until)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "buckets": len(self._buckets),
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "bucket_waits": {
+                k: {"waits": v[0], "wait_time": v[1]}
+                for k, v in self.bucket_waits.items()
+            },
+        }
+
+
+# KEYS: global state, bucket state (optional)
+# ARGV: global rate per second
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate = tonumber(ARGV[1])
+
+local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked_until') or '0')
+if blocked > now then
+    return blocked - now
+end
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'refilled')
+local tokens = tonumber(state[1] or rate)
+local refilled = tonumber(state[2] or now)
+tokens = math.min(rate, tokens + (now - refilled) * rate / 1000)
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'refilled', now)
+    return math.ceil((1 - tokens) * 1000 / rate)
+end
+
+if KEYS[2] then
+    local bucket = redis.call('HMGET', KEYS[2], 'limit', 'remaining', 'reset_at')
+    if bucket[1] then
+        local remaining = tonumber(bucket[2])
+        local reset_at = tonumber(bucket[3])
+        if reset_at <= now then
+            remaining = tonumber(bucket[1])
+        end
+        if remaining <= 0 then
+            redis.call('HSET', KEYS[1], 'tokens', tokens, 'refilled', now)
+            return reset_at - now
+        end
+        redis.call('HSET', KEYS[2], 'remaining', remaining - 1)
+    end
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'refilled', now)
+redis.call('PEXPIRE', KEYS[1], 60000)
+return 0
+"""
+
+# KEYS: bucket state
+# ARGV: limit, remaining, reset after (ms)
+UPDATE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local reset_at = now + tonumber(ARGV[3])
+local remaining = tonumber(ARGV[2])
+
+local bucket = redis.call('HMGET', KEYS[1], 'remaining', 'reset_at')
+if bucket[2] and reset_at <= tonumber(bucket[2]) + 500 then
+    -- same window, slots reserved by requests in flight stay taken
+    remaining = math.min(remaining, tonumber(bucket[1]))
+end
+
+redis.call('HSET', KEYS[1], 'limit', ARGV[1], 'remaining', remaining, 'reset_at', reset_at)
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[3]) + 60000)
+return remaining
+"""
+
+# KEYS: global state, bucket state
+# ARGV: retry after (ms), "1" when the limit is global
+RATE_LIMITED_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local until_ = now + tonumber(ARGV[1])
+
+if ARGV[2] == '1' then
+    local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked_until') or '0')
+    redis.call('HSET', KEYS[1], 'blocked_until', math.max(blocked, until_))
+    redis.call('PEXPIRE', KEYS[1], 60000)
+    return
+end
+
+local reset_at = tonumber(redis.call('HGET', KEYS[2], 'reset_at') or '0')
+redis.call('HSET', KEYS[2], 'remaining', 0, 'reset_at', math.max(reset_at, until_))
+if not redis.call('HGET', KEYS[2], 'limit') then
+    redis.call('HSET', KEYS[2], 'limit', 1)
+end
+redis.call('PEXPIRE', KEYS[2], tonumber(ARGV[1]) + 60000)
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    :class:`RateLimiter` with its buckets and global limit kept in redis so
+    every instance shares what discord has told any of them.
+
+    Reservations are made atomically by a script against the redis clock.
+    Route to bucket mappings never change so they're also kept in-process. If
+    redis is unavailable the in-process limiter takes over.
+    """
+
+    ROUTES_KEY = "ratelimit:routes"
+    GLOBAL_KEY = "ratelimit:global"
+    BUCKET_KEY = "ratelimit:bucket:{}"
+
+    def __init__(self, redis, *, global_rate: int = 50):
+        super().__init__(global_rate=global_rate)
+        self.redis = redis
+        self._scripts = {}
+
+    def _script(self, redis, source: str):
+        if (script := self._scripts.get(source)) is None:
+            script = self._scripts[source] = redis.register_script(source)
+        return script
+
+    def _bucket_key(self, route: Route) -> Optional[str]:
+        name = route_key(route)
+        if name not in self._routes:
+            try:
+                with self.redis as redis:
+                    if bucket_hash := redis.hget(self.ROUTES_KEY, name):
+                        self._routes[name] = bucket_hash
+            except RedisError:
+                pass
+        return super()._bucket_key(route)
+
+    def acquire(self, route: Route):
+        while True:
+            try:
+                key = self._bucket_key(route)
+                keys = [self.GLOBAL_KEY]
+                if key is not None:
+                    keys.append(self.BUCKET_KEY.format(key))
+                with self.redis as redis:
+                    delay = self._script(redis, ACQUIRE_SCRIPT)(
+                        keys=keys, args=[self.global_rate], client=redis
+                    )
+            except RedisError:
+                log.warning("Rate limits unavailable, limiting locally", exc_info=True)
+                return super().acquire(route)
+
+            if delay <= 0:
+                return
+            delay = delay / 1000
+            self._record_wait(route, delay)
+            time.sleep(delay)
+
+    def update(self, route: Route, headers: Mapping[str, str]):
+        super().update(route, headers)
+        if (bucket_hash := headers.get("X-RateLimit-Bucket")) is None:
+            return
+        try:
+            args = [
+                int(headers["X-RateLimit-Limit"]),
+                int(headers["X-RateLimit-Remaining"]),
+                int(float(headers["X-RateLimit-Reset-After"]) * 1000),
+            ]
+        except (KeyError, ValueError):
+            return
+
+        try:
+            with self.redis as redis:
+                redis.hset(self.ROUTES_KEY, route_key(route), bucket_hash)
+                self._script(redis, UPDATE_SCRIPT)(
+                    keys=[self.BUCKET_KEY.format(self._bucket_key(route))],
+                    args=args,
+                    client=redis,
+                )
+        except RedisError:
+            log.warning("Unable to share rate limit for %s", bucket_hash, exc_info=True)
+
+    def rate_limited(self, route: Route, retry_after: float, is_global: bool):
+        super().rate_limited(route, retry_after, is_global)
+        try:
+            with self.redis as redis:
+                self._script(redis, RATE_LIMITED_SCRIPT)(
+                    keys=[
+                        self.GLOBAL_KEY,
+                        self.BUCKET_KEY.format(self._bucket_key(route)),
+                    ],
+                    args=[int(retry_after * 1000), "1" if is_global else "0"],
+                    client=redis,
+                )
+        except RedisError:
+            log.warning("Unable to share rate limit", exc_info=True)
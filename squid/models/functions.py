@@ -1,13 +1,31 @@
 from functools import wraps
+import asyncio
+import importlib
+import logging
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Callable, List, Optional
 
-__all__ = ("Lazy", "lazy")
+__all__ = ("Lazy", "lazy", "lazy_import")
+
+log = logging.getLogger(__name__)
 
 
 class Lazy(object):
     """
     Lazily construct objects to speed up cold startup times
+
+    The value is built once even when several threads ask for it at the same
+    time, the others wait for it. If building it fails the next use tries
+    again. Setup functions wrapped with :func:`lazy` (or
+    :meth:`SquidBot.from_lazy`) report how long they took to every function
+    added with :meth:`add_hook`.
     """
 
+    hooks: List[Callable[[str, float], None]] = []
+
     def __init__(self, fn, *fn_args, **fn_kwargs):
         self.fn = fn
         self.fn_args = fn_args
@@ -15,16 +33,72 @@ class Lazy(object):
 
         self._value = None
         self._set_value = False
+        self._lock = threading.Lock()
+        self.elapsed: Optional[float] = None
 
-    def __enter__(self):
-        if not self._set_value:
-            self._value = self.fn(*self.fn_args, **self.fn_kwargs)
-            self._set_value = True
+    @property
+    def name(self) -> Optional[str]:
+        # set by functools.wraps
+        return self.__dict__.get("__qualname__")
+
+    @property
+    def ready(self) -> bool:
+        return self._set_value
+
+    @classmethod
+    def add_hook(cls, hook: Callable[[str, float], None]):
+        """Calls ``hook(name, seconds)`` whenever a named value is built"""
+        cls.hooks.append(hook)
+
+    def get(self):
+        if self._set_value:
+            return self._value
+
+        with self._lock:
+            if not self._set_value:
+                start = time.perf_counter()
+                self._value = self.fn(*self.fn_args, **self.fn_kwargs)
+                self.elapsed = time.perf_counter() - start
+                self._set_value = True
+
+                if self.name is not None:
+                    for hook in self.hooks:
+                        try:
+                            hook(self.name, self.elapsed)
+                        except Exception:
+                            log.exception("Lazy hook %r failed", hook)
         return self._value
 
+    def prewarm(self) -> threading.Thread:
+        """Starts building the value on a background thread, anything that
+        needs it before it's done waits for it"""
+        thread = threading.Thread(
+            target=self._prewarm, name=f"prewarm-{self.name}", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _prewarm(self):
+        try:
+            self.get()
+        except Exception:
+            log.exception("Unable to pre-warm %s", self.name)
+
+    def __enter__(self):
+        return self.get()
+
     def __exit__(self, *_):
         pass
 
+    async def __aenter__(self):
+        if self._set_value:
+            return self._value
+        # building it can block, so it's done off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+    async def __aexit__(self, *_):
+        pass
+
 
 def lazy(f):
     """
@@ -32,3 +106,42 @@ def lazy(f):
     """
 
     return wraps(f)(Lazy(f))
+
+
+class LazyModule(ModuleType):
+    """
+    Stands in for a module until one of its attributes is used
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_LazyModule__module"] = None
+
+    def _load(self) -> ModuleType:
+        if (module := self.__module) is None:
+            # the import lock makes concurrent first uses safe
+            module = self.__dict__["_LazyModule__module"] = importlib.import_module(
+                self.__name__
+            )
+        return module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__module is not None else "not loaded"
+        return f"<LazyModule {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Imports ``name`` the first time one of its attributes is used, for heavy
+    modules only some requests need. ``from name import x`` can't be deferred
+    so use ``module.x`` instead.
+    """
+    if (module := sys.modules.get(name)) is not None:
+        return module
+    return LazyModule(name)
@@ -62,8 +62,12 @@ class Guild(guild.Guild):
     @utils.cached_property
     def _channels(self):
         channels = {}
-        for channel_id in self._state._get_all(f"channelmap.guild.{self.id}"):
-            channel = self._state._get(f"channel.{channel_id}")
+        channel_ids = self._state._get_all(f"channelmap.guild.{self.id}")
+        for channel_id, channel in zip(
+            channel_ids, self._state._get_many(f"channel.{i}" for i in channel_ids)
+        ):
+            if not channel:
+                continue
             factory, _ = _channel_factory(channel["type"])
             channels[channel_id] = factory(guild=self, state=self._state, data=channel)
         return channels
@@ -81,14 +85,10 @@ class Guild(guild.Guild):
     @utils.cached_property
     def _roles(self):
         roles = []
-        for role in self._state._get_all(f"role.{self.id}"):
-            roles.append(
-                Role(
-                    guild=self,
-                    state=self._state,
-                    data=self._state._get(f"role.{self.id}.{role}"),
-                )
-            )
+        role_ids = self._state._get_all(f"role.{self.id}")
+        for data in self._state._get_many(f"role.{self.id}.{i}" for i in role_ids):
+            if data:
+                roles.append(Role(guild=self, state=self._state, data=data))
         return roles
 
     @property
@@ -118,11 +118,12 @@ class Guild(guild.Guild):
         return self._members()
 
     def get_member(self, user_id):
-        result = self._state._get(f"member.{self.id}.{user_id}")
-        result["user"] = self._state._get(f"user.{user_id}")
-        if result:
-            result = Member(guild=self, state=self._state, data=result)
-        return result
+        member, user = self._state._get_many(
+            [f"member.{self.id}.{user_id}", f"user.{user_id}"]
+        )
+        if member and user:
+            return Member(guild=self, state=self._state, data={**member, "user": user})
+        return None
 
     @property
     def roles(self):
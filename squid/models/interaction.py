@@ -6,6 +6,8 @@ from .enums import (
 )
 from .member import Member
 import json
+import time
+import orjson
 from discord import InteractionType, InteractionResponseType
 
 __all__ = (
@@ -17,8 +19,10 @@ __all__ = (
 
 
 class Interaction(object):
-    def __init__(self, *, data: str, state):
+    def __init__(self, *, data: str, state, received_at: float = None):
         self._state = state
+        # monotonic, responses are due 3 seconds after discord sent the request
+        self.received_at = received_at or time.monotonic()
         self._from_data(data)
 
     def _from_data(self, data: dict):
@@ -142,6 +146,27 @@ class Component(object):
     ...
 
 
+def _strip_empty(o):
+    """What :meth:`InteractionResponse.to_dict` does through a json round trip
+    without one"""
+    if isinstance(o, dict):
+        data = {}
+        for k, v in o.items():
+            v = _strip_empty(v)
+            if v is not None and v != [] and v != {}:
+                data[k] = v
+        return data
+    if isinstance(o, InteractionResponseType):
+        return None
+    if isinstance(o, (list, tuple)):
+        return [_strip_empty(i) for i in o]
+    if isinstance(o, AllowedMentions):
+        return _strip_empty(o.to_dict())
+    if o is None or isinstance(o, (str, int, float)):
+        return o
+    return _strip_empty(o.__dict__)
+
+
 class InteractionResponse(object):
     def __init__(
         self,
@@ -172,6 +197,8 @@ class InteractionResponse(object):
 
         self.choices = choices
 
+        self._json: Optional[bytes] = None
+
     @classmethod
     def pong(cls):
         return cls(InteractionResponseType.pong)
@@ -288,12 +315,15 @@ class InteractionResponse(object):
             return o.to_dict()
         return o.__dict__
 
+    def _fields(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
     def to_dict(self):
         return {
             "type": self.type.value,
             "data": json.loads(
                 json.dumps(
-                    self,
+                    self._fields(),
                     default=self.default,
                     sort_keys=True,
                 ),
@@ -302,3 +332,20 @@ class InteractionResponse(object):
                 },
             ),
         }
+
+    def to_json(self) -> bytes:
+        """Serializes the response straight to bytes"""
+        if self._json is not None:
+            return self._json
+        return orjson.dumps(
+            {"type": self.type.value, "data": _strip_empty(self._fields())}
+        )
+
+    def freeze(self) -> "InteractionResponse":
+        """Serializes the response once, for responses that never change
+
+        A frozen response must not be modified afterwards.
+        """
+        self._json = None
+        self._json = self.to_json()
+        return self
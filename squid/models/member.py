@@ -22,7 +22,7 @@ class Member(Messageable, member.Member):
 
     @property
     def channel_id(self):
-        return self.http.start_private_message(self.id)["id"]
+        return self._state.dm_channel_id(self.id)
 
     @property
     def avatar_url(self):
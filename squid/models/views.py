@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from discord.ui import View as _View, Button
 from discord.ui.view import _ViewWeights, Item
 from itertools import groupby
@@ -32,6 +32,14 @@ class ButtonData:
 class View(_View):
     KEY: str
 
+    # slow callbacks answer with a deferred update and finish in the
+    # background, see :class:`squid.bot.deferral.Deferral`
+    DEFER: bool = False
+    BUDGET: Optional[float] = None
+    # fast callbacks run on the request thread without the response deadline,
+    # they hand anything slow to :meth:`SquidBot.respond_in_time` themselves
+    INLINE: bool = False
+
     def __init__(self, cog=None):
         # self.children = []
         self._View__weights = _ViewWeights([])
@@ -1,20 +1,29 @@
-from typing import TYPE_CHECKING, Any, Dict
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Hashable, Optional
 import discord
 
-from grpc import Channel
 from squid.models.guild import Guild
 from squid.models.member import Member
+from squid.models.functions import Lazy
 from squid.models.settings import Setting
 import TagScriptEngine as tse
 from inspect import isfunction
 import json
 
 from collections import OrderedDict
+from redis.exceptions import RedisError
 
 if TYPE_CHECKING:
     from squid.bot.context import CommandContext, SquidContext
 
 
+def is_grpc_channel(v: Any) -> bool:
+    # nothing can be a grpc channel unless grpc was imported, so it isn't here
+    return (grpc := sys.modules.get("grpc")) is not None and isinstance(v, grpc.Channel)
+
+
 class LimitedSizeDict(OrderedDict):
     def __init__(self, *args, **kwds):
         self.size_limit = kwds.pop("size_limit", None)
@@ -31,12 +40,55 @@ class LimitedSizeDict(OrderedDict):
                 self.popitem(last=False)
 
 
+class SettingsCache(object):
+    """
+    Cross-request cache of guild settings documents.
+
+    Entries are stamped with the guild's settings version, read from
+    ``settings:version:{guild_id}`` in redis. Nothing bumps that key yet (the
+    dashboard writes settings straight to mongo), so the stamp stays ``None``
+    and an edit shows up once the entry's ttl runs out, within 30 seconds by
+    default. A writer that increments the key on every save makes edits show
+    on the next interaction.
+    """
+
+    def __init__(self, size_limit=512, ttl=30.0):
+        self.ttl = ttl
+        self._data = LimitedSizeDict(size_limit=size_limit)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version_key(guild_id) -> str:
+        return f"settings:version:{guild_id}"
+
+    def get(self, key: Hashable, version: Optional[str]) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, stamp, data = entry
+            if expires < time.monotonic() or stamp != version:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return data
+
+    def peek(self, key: Hashable) -> Optional[dict]:
+        """The cached data whatever its version, without touching the entry"""
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else entry[2]
+
+    def set(self, key: Hashable, version: Optional[str], data: dict):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, version, data)
+            self._data.move_to_end(key)
+
+
 class Settings(object):
     def __init__(self, settings: Dict[str, Setting]):
         self.settings = settings
-        self.cache = LimitedSizeDict(
-            size_limit=5
-        )  # just for multiple concurrent data accesses
+        self.cache = SettingsCache()
 
     @classmethod
     def from_data(cls, data: Dict[str, Dict[str, Any]]):
@@ -47,10 +99,24 @@ class Settings(object):
         return cls(data)
 
     def _transform_seed_variables(
-        self, seed_variables: dict
+        self, seed_variables: dict, references: Optional[FrozenSet[str]] = None
     ) -> Dict[str, "tse.Adapter"]:
+        """Builds adapters for the seed variables
+
+        Args:
+            seed_variables (dict): The raw variables, :class:`Lazy` values are only
+                resolved when they end up being used
+            references (Optional[FrozenSet[str]]): The names the tagscript can
+                reference, anything else is skipped. ``None`` builds everything
+        """
         data = {}
         for k, v in seed_variables.items():
+            if references is not None and k not in references:
+                continue
+            if isinstance(v, Lazy):
+                with v as value:
+                    v = value
+
             if isinstance(v, str):
                 data[k] = tse.StringAdapter(v)
             elif isinstance(v, int):
@@ -59,7 +125,7 @@ class Settings(object):
                 data[k] = tse.FunctionAdapter(v)
             elif isinstance(v, Member):
                 data[k] = tse.MemberAdapter(v)
-            elif isinstance(v, Channel):
+            elif is_grpc_channel(v):
                 data[k] = tse.ChannelAdapter(v)
             elif isinstance(v, discord.Object):
                 data[k] = tse.AttributeAdapter(v)
@@ -70,18 +136,79 @@ class Settings(object):
 
         return data
 
+    def _version(self, ctx: "SquidContext") -> Optional[str]:
+        """The guild's settings version, looked up once per interaction"""
+        memo = ctx.__dict__.setdefault("_settings_memo", {})
+        if "version" not in memo:
+            try:
+                with ctx.bot.redis as redis:
+                    memo["version"] = redis.get(self.cache.version_key(ctx.guild_id))
+            except RedisError:
+                memo["version"] = None
+        return memo["version"]
+
     def guild_settings(self, ctx: "CommandContext") -> dict:
-        # if not (data := self.cache.get(ctx.guild_id)):
-        with ctx.bot.db as db:
-            data = db.settings.find_one({"guild_id": str(ctx.guild_id)}) or {}
-        self.cache[ctx.guild_id] = data
-        r = {}
+        plugin = ctx.plugin.db_name
+        memo = ctx.__dict__.setdefault("_settings_memo", {})
+        if plugin in memo:
+            return memo[plugin]
 
-        for v, k in self.settings.get(ctx.plugin.db_name, {}).items():
+        version = self._version(ctx)
+        key = (ctx.guild_id, plugin)
+        data = self.cache.get(key, version)
+        if data is None:
+            with ctx.bot.db as db:
+                # only pulling the sub-document for this plugin
+                doc = db.settings.find_one(
+                    {"guild_id": str(ctx.guild_id)}, {plugin: 1, "_id": 0}
+                )
+            data = (doc or {}).get(plugin, {})
+            self.cache.set(key, version, data)
+
+        r = {}
+        for v, k in self.settings.get(plugin, {}).items():
+            r[v] = data.get(v, k.default)
 
-            r[v] = data.get(ctx.plugin.db_name, {}).get(v, k.default)
+        memo[plugin] = r
         return r
 
+    def prime(self, bot, guild_ids) -> int:
+        """Loads every plugin's settings for ``guild_ids`` into the cache with
+        one redis and one mongo round trip, returns the documents found"""
+        guild_ids = [int(g) for g in guild_ids]
+        if not guild_ids:
+            return 0
+
+        with bot.redis as redis:
+            versions = redis.mget([self.cache.version_key(g) for g in guild_ids])
+        with bot.db as db:
+            docs = {
+                int(doc.pop("guild_id")): doc
+                for doc in db.settings.find(
+                    {"guild_id": {"$in": [str(g) for g in guild_ids]}}, {"_id": 0}
+                )
+            }
+
+        for guild_id, version in zip(guild_ids, versions):
+            doc = docs.get(guild_id, {})
+            for plugin in self.settings:
+                self.cache.set((guild_id, plugin), version, doc.get(plugin, {}))
+        return len(docs)
+
+    def templates(self, guild_ids=()) -> set:
+        """The tagscript in the default string settings and the cached ones
+        of ``guild_ids``"""
+        sources = set()
+        for plugin, settings in self.settings.items():
+            for name, setting in settings.items():
+                if setting.typ != "string":
+                    continue
+                sources.add(setting.default)
+                for guild_id in guild_ids:
+                    if (data := self.cache.peek((int(guild_id), plugin))) is not None:
+                        sources.add(data.get(name))
+        return {s for s in sources if isinstance(s, str) and "{" in s}
+
     @staticmethod
     def fmt_output(ctx, v: Any, data: dict) -> Any:
         """Modifying output to suppoprt valid types
@@ -124,8 +251,10 @@ class Settings(object):
                 )
 
             # processing tagscript
-            seed_variables = self._transform_seed_variables(kw)
             with ctx.bot.engine as engine:
+                seed_variables = self._transform_seed_variables(
+                    kw, engine.references(setting)
+                )
                 return engine.process(setting, seed_variables=seed_variables).body
 
         raise KeyError(name)
@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+from copy import copy
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import TagScriptEngine as tse
+from TagScriptEngine.exceptions import ProcessError, TagScriptError
+from TagScriptEngine.interpreter import Node, Response, build_node_tree
+
+__all__ = ("Program", "CompiledInterpreter")
+
+# the limit tse.Interpreter._solve parses verbs with
+VERB_LIMIT = 2000
+
+
+class _CompiledNode(Node):
+    __slots__ = ("compiled_verb",)
+
+
+class Program(object):
+    """
+    A TagScript source parsed once into its block layout.
+
+    Innermost blocks never have their text rewritten before they run so their
+    verbs are parsed here and reused, everything else is re-parsed from the
+    partially rendered output exactly like :class:`tse.Interpreter` does.
+    """
+
+    __slots__ = ("coordinates", "leaves", "variables", "_verbs")
+
+    def __init__(self, source: str):
+        self.coordinates: Tuple[Tuple[int, int], ...] = tuple(
+            n.coordinates for n in build_node_tree(source)
+        )
+
+        # nodes are emitted innermost first, a node is a leaf when nothing
+        # emitted before it sits inside its brackets
+        self.leaves: Tuple[bool, ...] = tuple(
+            not any(s < s2 and e2 < e for s2, e2 in self.coordinates[:i])
+            for i, (s, e) in enumerate(self.coordinates)
+        )
+        self._verbs: Dict[Tuple[int, bool], List[Optional[tse.Verb]]] = {}
+        self.variables = self._find_variables(source)
+
+    def _find_variables(self, source: str) -> Optional[FrozenSet[str]]:
+        """Every name a block in this program could look up as a variable.
+
+        ``None`` means a declaration is built at runtime (``{{name}}``) and the
+        referenced variables can't be known ahead of time.
+        """
+        names = set()
+        for s, e in self.coordinates:
+            declaration = tse.Verb(source[s : e + 1], limit=VERB_LIMIT).declaration
+            if not declaration:
+                continue
+            if "{" in declaration:
+                return None
+            names.add(declaration)
+            names.add(declaration.split(".")[0])
+        return frozenset(names)
+
+    def __repr__(self):
+        return f"<Program blocks={len(self.coordinates)}>"
+
+    def verbs(self, source: str, verb_limit: int, dot_parameter: bool):
+        key = (verb_limit, dot_parameter)
+        if (verbs := self._verbs.get(key)) is None:
+            verbs = self._verbs[key] = [
+                (
+                    tse.Verb(
+                        source[s : e + 1], limit=verb_limit, dot_parameter=dot_parameter
+                    )
+                    if leaf
+                    else None
+                )
+                for (s, e), leaf in zip(self.coordinates, self.leaves)
+            ]
+        return verbs
+
+    def nodes(self, source: str, verb_limit: int, dot_parameter: bool) -> List[Node]:
+        """Fresh nodes for a single run, the interpreter mutates them while solving"""
+        nodes = []
+        for coords, verb in zip(
+            self.coordinates, self.verbs(source, verb_limit, dot_parameter)
+        ):
+            node = _CompiledNode(coords)
+            node.compiled_verb = verb
+            nodes.append(node)
+        return nodes
+
+
+class CompiledInterpreter(tse.Interpreter):
+    """
+    :class:`tse.Interpreter` that keeps an LRU of compiled programs keyed by
+    the source so repeated renders skip parsing entirely.
+    """
+
+    __slots__ = ("maxsize", "hits", "misses", "_programs", "_lock")
+
+    def __init__(self, blocks: List[tse.Block], *, maxsize: int = 1024):
+        super().__init__(blocks)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._programs: "OrderedDict[str, Program]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, source: str) -> Program:
+        with self._lock:
+            if (program := self._programs.get(source)) is not None:
+                self._programs.move_to_end(source)
+                self.hits += 1
+                return program
+            self.misses += 1
+
+        program = Program(source)
+        with self._lock:
+            self._programs[source] = program
+            while len(self._programs) > self.maxsize:
+                self._programs.popitem(last=False)
+        return program
+
+    def references(self, source: str) -> Optional[FrozenSet[str]]:
+        """The variable names ``source`` may reference, ``None`` if unknowable"""
+        return self.compile(source).variables
+
+    def _get_context(self, node: Node, final: str, **kwargs) -> tse.Context:
+        verb = getattr(node, "compiled_verb", None)
+        if verb is None:
+            return super()._get_context(node, final, **kwargs)
+
+        node.verb = copy(verb)
+        return tse.Context(
+            node.verb, kwargs["response"], self, kwargs["original_message"]
+        )
+
+    def process(
+        self,
+        message: str,
+        seed_variables: Optional[Dict[str, tse.Adapter]] = None,
+        *,
+        charlimit: Optional[int] = None,
+        dot_parameter: bool = False,
+        **kwargs,
+    ) -> Response:
+        response = Response(variables=seed_variables, extra_kwargs=kwargs)
+        program = self.compile(message)
+        if not program.coordinates:
+            # plain text, nothing to solve
+            return self._return_response(response, message)
+
+        try:
+            output = self._solve(
+                message,
+                program.nodes(message, VERB_LIMIT, dot_parameter),
+                response,
+                charlimit=charlimit,
+                dot_parameter=dot_parameter,
+            )
+        except TagScriptError:
+            raise
+        except Exception as error:
+            raise ProcessError(error, response, self) from error
+        return self._return_response(response, output)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._programs),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -157,7 +157,7 @@ def evaluate_annotation(
         except AttributeError:
             return tp.__origin__[evaluated_args]
 
-    return
+    return tp
 
 
 regex = re.compile(
@@ -0,0 +1,90 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from discord import InteractionResponseType, InteractionType
+
+from squid.bot import SquidBot
+from squid.models.interaction import InteractionResponse
+
+
+def context(received_at: float):
+    interaction = SimpleNamespace(
+        type=InteractionType.application_command,
+        received_at=received_at,
+        guild_id=None,
+        channel_id=None,
+        user=None,
+        member=None,
+    )
+    return SimpleNamespace(interaction=interaction, application_id=1, token="t")
+
+
+def make_bot():
+    bot = SquidBot(public_key="0" * 64, token="t")
+    delivered = threading.Event()
+    bot.deferral.deliver = lambda ctx, response, ack: delivered.set()
+    return bot, delivered
+
+
+def test_slow_handler_is_deferred_by_default():
+    bot, delivered = make_bot()
+
+    def slow(ctx):
+        time.sleep(0.3)
+        return InteractionResponse.channel_message(content="late")
+
+    # 2.1s of the default deadline are gone by the time the handler runs
+    ctx = context(time.monotonic() - bot.response_deadline + 0.1)
+    response = bot.respond_in_time(ctx, slow)
+
+    assert response.type == InteractionResponseType.deferred_channel_message
+    assert delivered.wait(1)
+    assert bot.deferral.stats["deferred"] == 1
+
+
+def test_fast_handler_is_answered_directly():
+    bot, delivered = make_bot()
+
+    response = bot.respond_in_time(
+        context(time.monotonic()),
+        lambda ctx: InteractionResponse.channel_message(content="fast"),
+    )
+
+    assert response.type == InteractionResponseType.channel_message
+    assert not delivered.is_set()
+
+
+def test_no_deadline_runs_inline():
+    bot, _ = make_bot()
+    bot.response_deadline = None
+    thread = []
+
+    def handler(ctx):
+        thread.append(threading.current_thread())
+        return InteractionResponse.channel_message(content="inline")
+
+    bot.respond_in_time(context(time.monotonic()), handler)
+
+    assert thread == [threading.current_thread()]
+    assert bot.deferral.stats == {
+        "answered": 0,
+        "deferred": 0,
+        "delivered": 0,
+        "failed": 0,
+    }
+
+
+def test_inline_handler_skips_the_deadline():
+    bot, _ = make_bot()
+    thread = []
+
+    def handler(ctx):
+        thread.append(threading.current_thread())
+        return InteractionResponse.channel_message(content="inline")
+
+    ctx = context(time.monotonic() - bot.response_deadline)
+    response = bot.respond_in_time(ctx, handler, inline=True)
+
+    assert response.type == InteractionResponseType.channel_message
+    assert thread == [threading.current_thread()]
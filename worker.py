@@ -0,0 +1,31 @@
+"""
+Ends giveaways and timers when they come due, and edits in giveaway entry
+counts after a burst of clicks.
+
+Runs alongside the function, start as many as needed (they share the queues):
+    python worker.py
+"""
+
+import os
+import signal
+
+from main import lazy_bot
+from squid.bot.scheduler import Scheduler
+
+
+def main():
+    with lazy_bot as bot:
+        scheduler = Scheduler(
+            bot,
+            concurrency=int(os.getenv("SCHEDULER_CONCURRENCY", 4)),
+            lease=float(os.getenv("SCHEDULER_LEASE", 60)),
+        )
+        signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()